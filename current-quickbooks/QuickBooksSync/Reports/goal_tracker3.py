@@ -5,299 +5,474 @@ Generates PDF reports for bagged and invoiced sales by rep
 """
 
 import sqlite3
+import heapq
 import json
+import operator
 import sys
+import io
+from collections import namedtuple
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, KeepTogether
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.graphics.shapes import Drawing, Rect, String
-from reportlab.graphics import renderPDF
+from functools import lru_cache
 import os
 
+# Compact JSON for the snapshot columns - orjson when installed, else the stdlib encoder
+try:
+    import orjson
+
+    def dumps_compact(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def dumps_compact(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+# One row of the GL account section: account name, MTD invoiced, bagged, total
+GLRow = namedtuple('GLRow', ['gl_account', 'invoiced', 'bagged', 'total'])
+
+# Order lines counted as bagged (likely to ship by month-end). Parameters:
+# Stock Wait cutoff, month start, next month start
+BAGGED_FILTER = """
+    (
+        -- Include Released, Date Wait, Need Payment, Stock Transfer, New always
+        (CustomField_Line_Line_Status IN ('Released', 'Date Wait', 'Need Payment', 'Stock Transfer', 'New')
+         OR CustomField_Line_Line_Status IS NULL)
+        -- Include Stock Wait ONLY if promised date is NOT in last 5 days of month
+        OR (CustomField_Line_Line_Status = 'Stock Wait' 
+            AND CustomField_Line_Promised_Date < ?)
+    )
+    AND CustomField_Line_Line_Status NOT IN ('Blanket', 'Credit Hold')
+    AND CustomField_Line_Promised_Date >= ?
+    AND CustomField_Line_Promised_Date < ?
+    AND TemplateRef_FullName LIKE '%Sales Order%'
+"""
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """
+    Paragraph and table styles shared by every report run, built on first use
+    so importing this module doesn't load ReportLab. Only the summary's gap-row
+    highlight depends on the figures and is layered on in generate_pdf_report
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    sample = getSampleStyleSheet()
+
+    # Header row plus a bold TOTAL row - rep and today's invoiced tables
+    totals_table = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ])
+
+    return {
+        'sample': sample,
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=sample['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1f4788'),
+            spaceAfter=30,
+            alignment=1  # Center
+        ),
+        'perf_explanation': ParagraphStyle(
+            'PerfExplanation',
+            parent=sample['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#444444'),
+            alignment=1,  # Center
+            spaceAfter=20
+        ),
+        # Rep and GL section headings
+        'section_heading': ParagraphStyle(
+            'SectionHeading',
+            parent=sample['Heading2'],
+            keepWithNext=True,  # This keeps the heading with the table
+            spaceAfter=12
+        ),
+        'progress_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.lightyellow),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+        ]),
+        'summary_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ]),
+        'totals_table': totals_table,
+        'gl_table': TableStyle([
+            ('FONTSIZE', (0, 1), (0, -2), 9),  # Smaller font for GL account names
+        ], parent=totals_table),
+    }
+
+
+# Fixed row heights, so ReportLab doesn't measure every cell to size the rows.
+# Body rows fit 11pt text with the default padding; header rows fit a 12pt
+# heading with the styles' 12pt bottom padding
+TABLE_ROW_HEIGHT = 0.28 * 72  # 72 points per inch
+TABLE_HEADER_HEIGHT = 0.42 * 72
+
+
+def table_row_heights(data, header=True):
+    """Row heights for a table's data - a header row then fixed-height body rows"""
+    if header:
+        return [TABLE_HEADER_HEIGHT] + [TABLE_ROW_HEIGHT] * (len(data) - 1)
+    return [TABLE_ROW_HEIGHT] * len(data)
+
+
+# Weekday dates that are not business days (statutory holidays) - add as needed
+BUSINESS_HOLIDAYS = frozenset()
+
+# Display name of the GL account joined as acc, matching invoiced_view.GLAccount
+GL_ACCOUNT_NAME = """
+    CASE 
+        WHEN acc.AccountNumber IS NOT NULL AND acc.Name IS NOT NULL 
+        THEN acc.AccountNumber || ' · ' || acc.Name
+        WHEN acc.FullName IS NOT NULL 
+        THEN acc.FullName
+        ELSE 'No GL Account'
+    END"""
+
+# Formats a number as currency.
+# Memoized on the amount itself (so output is unchanged): zeros, totals and the
+# summary figures recur across the summary, rep, GL and today's tables
+CURRENCY_FORMAT = lru_cache(maxsize=4096)('${:,.2f}'.format)
+
+# Income account of each item type as (item table, account expression) - {row}
+# is the column prefix ('' in queries, 'NEW.' in triggers)
+ITEM_ACCOUNT_SOURCES = (
+    ('items_inventory', "{row}IncomeAccountRef_ListID"),
+    ('items_inventory_assembly', "{row}IncomeAccountRef_ListID"),
+    ('items_noninventory',
+     "COALESCE({row}SalesAndPurchase_IncomeAccountRef_ListID, {row}SalesOrPurchase_AccountRef_ListID)"),
+    ('items_service',
+     "COALESCE({row}SalesAndPurchase_IncomeAccountRef_ListID, {row}SalesOrPurchase_AccountRef_ListID)"),
+    ('items_other_charge', "{row}SalesOrPurchase_AccountRef_ListID"),
+)
+
+# Every item with its income account - an item is in exactly one item table
+ITEM_ACCOUNT_UNION = "\n            UNION ALL\n            ".join(
+    f"SELECT ListID, {account.format(row='')} AS AccountListID FROM {table}"
+    for table, account in ITEM_ACCOUNT_SOURCES
+)
+
 
 class GoalTrackerIII:
     def __init__(self, db_path, selected_reps=None):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.conn = sqlite3.connect(db_path, timeout=30.0)
         self.conn.row_factory = sqlite3.Row
+
+        # Same settings as the sync database, with a bigger page cache and memory
+        # mapping since the report re-reads the same view pages for every query
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        self.conn.execute("PRAGMA busy_timeout=30000")
         self.today = date.today()
         self.month_start = date(self.today.year, self.today.month, 1)
+        self.next_month_start = next_month_start = (self.month_start + timedelta(days=32)).replace(day=1)
+
+        # Date bounds bound into the queries as ISO strings - computed once here
+        # instead of SQLite evaluating DATE('now', ...) for every row. Ranges are
+        # half-open so stored values with a time part still compare correctly
+        self.today_iso = self.today.isoformat()
+        self.tomorrow_iso = (self.today + timedelta(days=1)).isoformat()
+        self.month_start_iso = self.month_start.isoformat()
+        self.next_month_start_iso = next_month_start.isoformat()
+        self.stock_wait_cutoff_iso = (next_month_start - timedelta(days=5)).isoformat()
         self.selected_reps = selected_reps  # List of rep names to include, None = all reps
+        self.selected_rep_set = frozenset(selected_reps) if selected_reps else None
+        # Per-month figures, computed on first use - self.today is fixed for the run
+        self._monthly_target = None
+        self._business_days_total = None
+        self._business_days_elapsed = None
+        self.ensure_report_indexes()
+        self.ensure_gl_bridge()
+
+    def ensure_report_indexes(self):
+        """Index the sales order line columns the bagged sales filter ranges over"""
+        # open_sales_orders_view reads the promised date and line status from the
+        # sales order line table; custom field columns only exist once QuickBooks
+        # has returned them, so check before indexing
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("PRAGMA table_info(sales_orders_line_items)")
+            columns = {row['name'] for row in cursor.fetchall()}
+            if {'CustomField_Line_Promised_Date', 'CustomField_Line_Line_Status'} <= columns:
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_sales_orders_line_items_promised_status
+                    ON sales_orders_line_items (CustomField_Line_Promised_Date, CustomField_Line_Line_Status)
+                """)
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: could not create report indexes: {e}")
+
+    def ensure_gl_bridge(self):
+        """
+        Keep item_gl_bridge (item ListID -> income account ListID) in step with
+        the item tables through triggers, so the GL breakdown does one lookup per
+        order line. The bridge is rebuilt whenever a trigger is missing - on the
+        first run, or after the sync recreated an item table
+        """
+        self.gl_bridge_ready = False
+        trigger_names = {f"trg_{table}_gl_bridge_{event}"
+                         for table, _ in ITEM_ACCOUNT_SOURCES for event in ('ins', 'upd', 'del')}
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT name FROM sqlite_master
+                WHERE (type = 'trigger' AND name LIKE 'trg_%_gl_bridge_%')
+                   OR (type = 'table' AND name = 'item_gl_bridge')
+            """)
+            existing = {row['name'] for row in cursor.fetchall()}
+
+            if not (trigger_names | {'item_gl_bridge'}) <= existing:
+                cursor.execute("BEGIN")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS item_gl_bridge (
+                        ListID TEXT PRIMARY KEY,
+                        AccountListID TEXT
+                    )
+                """)
+                cursor.execute("DELETE FROM item_gl_bridge")
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO item_gl_bridge (ListID, AccountListID)
+                    {ITEM_ACCOUNT_UNION}
+                """)
+                for table, account in ITEM_ACCOUNT_SOURCES:
+                    new_account = account.format(row='NEW.')
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_gl_bridge_ins AFTER INSERT ON {table}
+                        BEGIN
+                            INSERT OR REPLACE INTO item_gl_bridge (ListID, AccountListID)
+                            VALUES (NEW.ListID, {new_account});
+                        END
+                    """)
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_gl_bridge_upd AFTER UPDATE ON {table}
+                        BEGIN
+                            DELETE FROM item_gl_bridge WHERE ListID = OLD.ListID;
+                            INSERT OR REPLACE INTO item_gl_bridge (ListID, AccountListID)
+                            VALUES (NEW.ListID, {new_account});
+                        END
+                    """)
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_gl_bridge_del AFTER DELETE ON {table}
+                        BEGIN
+                            DELETE FROM item_gl_bridge WHERE ListID = OLD.ListID;
+                        END
+                    """)
+                self.conn.commit()
+
+            self.gl_bridge_ready = True
+        except sqlite3.Error as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            print(f"Warning: could not set up GL account bridge, joining item tables instead: {e}")
 
     def is_business_day(self, check_date):
         """Check if date is a business day (not weekend)"""
         if check_date.weekday() >= 5:  # Saturday = 5, Sunday = 6
             return False
-        # Add specific holidays here if needed
-        # For now, just checking weekends
-        return True
+        return check_date not in BUSINESS_HOLIDAYS
+
+    @staticmethod
+    def count_business_days(start, end):
+        """
+        Count business days in [start, end) - whole weeks are counted as 5 days
+        at once, so only the leftover (< 7) days are checked one by one
+        """
+        total_days = (end - start).days
+        if total_days <= 0:
+            return 0
+
+        full_weeks, extra_days = divmod(total_days, 7)
+        start_weekday = start.weekday()
+        business_days = full_weeks * 5
+        business_days += sum(1 for offset in range(extra_days) if (start_weekday + offset) % 7 < 5)
+        business_days -= sum(1 for holiday in BUSINESS_HOLIDAYS
+                             if start <= holiday < end and holiday.weekday() < 5)
+        return business_days
 
     def get_monthly_target(self):
         """Get the monthly sales target"""
-        year_month = self.today.strftime('%Y-%m')
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT target_amount FROM monthly_targets 
-            WHERE year_month = ?
-        """, (year_month,))
-        result = cursor.fetchone()
-        return float(result['target_amount']) if result else 0.0
-
-    def get_bagged_sales(self):
-        """Get bagged sales (orders likely to ship by month-end)"""
+        if self._monthly_target is None:
+            year_month = self.today.strftime('%Y-%m')
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT target_amount FROM monthly_targets 
+                WHERE year_month = ?
+            """, (year_month,))
+            result = cursor.fetchone()
+            self._monthly_target = float(result['target_amount']) if result else 0.0
+        return self._monthly_target
+
+    def materialize_bagged_rows(self):
+        """
+        Copy the bagged order lines into a temp table once, so the rep and GL
+        breakdowns don't each rescan open_sales_orders_view.
+        Returns the temp table name to pass to _load_all_totals
+        """
         cursor = self.conn.cursor()
-
-        # Overall bagged sales - NO REP FILTER (company-wide total)
-        cursor.execute("""
-            SELECT 
-                SUM(Remainder) as total_bagged
-            FROM open_sales_orders_view
-            WHERE 
-                (
-                    -- Include Released, Date Wait, Need Payment, Stock Transfer, New always
-                    (CustomField_Line_Line_Status IN ('Released', 'Date Wait', 'Need Payment', 'Stock Transfer', 'New')
-                     OR CustomField_Line_Line_Status IS NULL)
-                    -- Include Stock Wait ONLY if promised date is NOT in last 5 days of month
-                    OR (CustomField_Line_Line_Status = 'Stock Wait' 
-                        AND DATE(CustomField_Line_Promised_Date) < DATE('now', 'start of month', '+1 month', '-5 days'))
-                )
-                AND CustomField_Line_Line_Status NOT IN ('Blanket', 'Credit Hold')
-                AND DATE(CustomField_Line_Promised_Date) >= DATE('now', 'start of month')
-                AND DATE(CustomField_Line_Promised_Date) <= DATE('now', 'start of month', '+1 month', '-1 day')
-                AND TemplateRef_FullName LIKE '%Sales Order%'
-        """)
-        total_result = cursor.fetchone()
-        total_bagged = float(total_result['total_bagged'] or 0)
-
-        # Bagged sales by rep - WITH REP FILTER (only selected reps in breakdown)
-        rep_filter = ""
-        if self.selected_reps:
-            rep_list = "','".join(self.selected_reps)
-            rep_filter = f"AND SalesRepRef_FullName IN ('{rep_list}')"
-
+        cursor.execute("DROP TABLE IF EXISTS temp.bagged_rows")
         cursor.execute(f"""
-            SELECT 
-                COALESCE(SalesRepRef_FullName, 'Unassigned') as rep_name,
-                SUM(Remainder) as rep_bagged
+            CREATE TEMP TABLE bagged_rows AS
+            SELECT Remainder, SalesRepRef_FullName, ItemRef_ListID
             FROM open_sales_orders_view
-            WHERE 
-                (
-                    -- Include Released, Date Wait, Need Payment, Stock Transfer, New always
-                    (CustomField_Line_Line_Status IN ('Released', 'Date Wait', 'Need Payment', 'Stock Transfer', 'New')
-                     OR CustomField_Line_Line_Status IS NULL)
-                    -- Include Stock Wait ONLY if promised date is NOT in last 5 days of month
-                    OR (CustomField_Line_Line_Status = 'Stock Wait' 
-                        AND DATE(CustomField_Line_Promised_Date) < DATE('now', 'start of month', '+1 month', '-5 days'))
-                )
-                AND CustomField_Line_Line_Status NOT IN ('Blanket', 'Credit Hold')
-                AND DATE(CustomField_Line_Promised_Date) >= DATE('now', 'start of month')
-                AND DATE(CustomField_Line_Promised_Date) <= DATE('now', 'start of month', '+1 month', '-1 day')
-                AND TemplateRef_FullName LIKE '%Sales Order%'
-                {rep_filter}
-            GROUP BY SalesRepRef_FullName
-            ORDER BY rep_bagged DESC
-        """)
-
-        rep_data = {}
-        for row in cursor.fetchall():
-            rep_data[row['rep_name']] = float(row['rep_bagged'])
-
-        return total_bagged, rep_data
-
-    def get_invoiced_sales_today(self):
-        """Get today's invoiced sales"""
-        cursor = self.conn.cursor()
-
-        # Overall invoiced today - NO REP FILTER (company-wide total)
-        cursor.execute("""
-            SELECT 
-                SUM(TotalCAD) as total_invoiced
-            FROM invoiced_view
-            WHERE DATE(InvoiceDate) = DATE('now')
-        """)
-        total_result = cursor.fetchone()
-        total_invoiced = float(total_result['total_invoiced'] or 0)
-
-        # Invoiced by rep today - WITH REP FILTER (only selected reps in breakdown)
-        rep_filter = ""
-        if self.selected_reps:
-            rep_list = "','".join(self.selected_reps)
-            rep_filter = f"AND SalesRep IN ('{rep_list}')"
-
-        cursor.execute(f"""
-            SELECT 
-                COALESCE(SalesRep, 'Unassigned') as rep_name,
-                SUM(TotalCAD) as rep_invoiced
-            FROM invoiced_view
-            WHERE DATE(InvoiceDate) = DATE('now')
-                {rep_filter}
-            GROUP BY SalesRep
-            ORDER BY rep_invoiced DESC
-        """)
-
-        rep_data = {}
-        for row in cursor.fetchall():
-            rep_data[row['rep_name']] = float(row['rep_invoiced'])
-
-        return total_invoiced, rep_data
-
-    def get_sales_by_gl_account(self):
-        """Get sales breakdown by GL Account"""
-        cursor = self.conn.cursor()
-
-        # Get invoiced sales by GL Account (MTD)
-        cursor.execute("""
-            SELECT 
-                GLAccount,
-                SUM(TotalCAD) as invoiced_amount
-            FROM invoiced_view
-            WHERE DATE(InvoiceDate) >= DATE('now', 'start of month')
-                AND DATE(InvoiceDate) <= DATE('now')
-            GROUP BY GLAccount
-        """)
-
-        gl_invoiced = {}
-        for row in cursor.fetchall():
-            gl_invoiced[row['GLAccount']] = float(row['invoiced_amount'])
-
-        # Get bagged sales by GL Account
-        # First need to join open_sales_orders_view with item tables to get GL accounts
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN acc.AccountNumber IS NOT NULL AND acc.Name IS NOT NULL 
-                    THEN acc.AccountNumber || ' · ' || acc.Name
-                    WHEN acc.FullName IS NOT NULL 
-                    THEN acc.FullName
-                    ELSE 'No GL Account'
-                END AS GLAccount,
-                SUM(osov.Remainder) as bagged_amount
-            FROM open_sales_orders_view osov
-            -- Join to item tables to get income account
-            LEFT JOIN items_inventory ii ON ii.ListID = osov.ItemRef_ListID
-            LEFT JOIN items_inventory_assembly iia ON iia.ListID = osov.ItemRef_ListID
-            LEFT JOIN items_noninventory ini ON ini.ListID = osov.ItemRef_ListID
-            LEFT JOIN items_service isi ON isi.ListID = osov.ItemRef_ListID
-            LEFT JOIN items_other_charge ioc ON ioc.ListID = osov.ItemRef_ListID
-            -- Join to accounts table
-            LEFT JOIN accounts acc ON acc.ListID = COALESCE(
-                ii.IncomeAccountRef_ListID,
-                iia.IncomeAccountRef_ListID,
-                ini.SalesAndPurchase_IncomeAccountRef_ListID,
-                ini.SalesOrPurchase_AccountRef_ListID,
-                isi.SalesAndPurchase_IncomeAccountRef_ListID,
-                isi.SalesOrPurchase_AccountRef_ListID,
-                ioc.SalesOrPurchase_AccountRef_ListID
-            )
-            WHERE 
-                (
-                    (osov.CustomField_Line_Line_Status IN ('Released', 'Date Wait', 'Need Payment', 'Stock Transfer', 'New')
-                     OR osov.CustomField_Line_Line_Status IS NULL)
-                    OR (osov.CustomField_Line_Line_Status = 'Stock Wait' 
-                        AND DATE(osov.CustomField_Line_Promised_Date) < DATE('now', 'start of month', '+1 month', '-5 days'))
-                )
-                AND osov.CustomField_Line_Line_Status NOT IN ('Blanket', 'Credit Hold')
-                AND DATE(osov.CustomField_Line_Promised_Date) >= DATE('now', 'start of month')
-                AND DATE(osov.CustomField_Line_Promised_Date) <= DATE('now', 'start of month', '+1 month', '-1 day')
-                AND osov.TemplateRef_FullName LIKE '%Sales Order%'
-            GROUP BY GLAccount
-        """)
-
-        gl_bagged = {}
-        for row in cursor.fetchall():
-            gl_bagged[row['GLAccount']] = float(row['bagged_amount'])
-
+            WHERE {BAGGED_FILTER}
+        """, self._bagged_filter_params())
+        cursor.execute("CREATE INDEX temp.idx_bagged_rows_item ON bagged_rows (ItemRef_ListID)")
+        return 'temp.bagged_rows'
+
+    def _bagged_filter_params(self):
+        return self.stock_wait_cutoff_iso, self.month_start_iso, self.next_month_start_iso
+
+    def _bagged_source(self, bagged_table=None):
+        """Return (FROM clause source, parameters) for the bagged order lines"""
+        if bagged_table:
+            return bagged_table, ()
+        return (f"(SELECT Remainder, SalesRepRef_FullName, ItemRef_ListID "
+                f"FROM open_sales_orders_view WHERE {BAGGED_FILTER})"), self._bagged_filter_params()
+
+    @staticmethod
+    def _combine_gl(gl_invoiced, gl_bagged):
+        """Merge {GL account: amount} dicts into the report's gl_data rows"""
         # Combine all GL accounts
-        all_gl_accounts = set(gl_invoiced.keys()) | set(gl_bagged.keys())
+        all_gl_accounts = gl_invoiced.keys() | gl_bagged.keys()
 
         gl_data = []
         for gl_account in sorted(all_gl_accounts):
             invoiced = gl_invoiced.get(gl_account, 0)
             bagged = gl_bagged.get(gl_account, 0)
-            gl_data.append({
-                'gl_account': gl_account,
-                'invoiced': invoiced,
-                'bagged': bagged,
-                'total': invoiced + bagged
-            })
+            gl_data.append(GLRow(gl_account, invoiced, bagged, invoiced + bagged))
 
         return gl_data
 
-    def get_month_to_date_sales(self):
-        """Get month-to-date invoiced sales"""
+    def _load_all_totals(self, bagged_table=None):
+        """
+        Every figure the report reads from the order lines, in one statement:
+        invoiced lines for the month grouped by (rep, GL account, invoiced today)
+        and bagged lines grouped by (rep, GL account), partitioned here into the
+        report's totals, today's invoiced by rep, (rep, mtd, bagged) rows - None
+        for a source the rep has no sales in - and gl_data rows
+        bagged_table: temp table from materialize_bagged_rows, None = query the view
+        """
         cursor = self.conn.cursor()
+        cursor.row_factory = None  # Plain tuples - no sqlite3.Row per result row
+        source, bagged_params = self._bagged_source(bagged_table)
+        item_account = 'item_gl_bridge' if self.gl_bridge_ready else f"({ITEM_ACCOUNT_UNION})"
 
-        # Overall MTD - NO REP FILTER (company-wide total)
-        cursor.execute("""
-            SELECT 
-                SUM(TotalCAD) as total_mtd
-            FROM invoiced_view
-            WHERE DATE(InvoiceDate) >= DATE('now', 'start of month')
-                AND DATE(InvoiceDate) <= DATE('now')
-        """)
-        total_result = cursor.fetchone()
-        total_mtd = float(total_result['total_mtd'] or 0)
-
-        # MTD by rep - WITH REP FILTER (only selected reps in breakdown)
-        rep_filter = ""
-        if self.selected_reps:
-            rep_list = "','".join(self.selected_reps)
-            rep_filter = f"AND SalesRep IN ('{rep_list}')"
-
+        # Ordered by display rep name so the reps come out in rep table order
         cursor.execute(f"""
-            SELECT 
-                COALESCE(SalesRep, 'Unassigned') as rep_name,
-                SUM(TotalCAD) as rep_mtd
-            FROM invoiced_view
-            WHERE DATE(InvoiceDate) >= DATE('now', 'start of month')
-                AND DATE(InvoiceDate) <= DATE('now')
-                {rep_filter}
-            GROUP BY SalesRep
-            ORDER BY rep_mtd DESC
-        """)
-
-        rep_data = {}
-        for row in cursor.fetchall():
-            rep_data[row['rep_name']] = float(row['rep_mtd'])
-
-        return total_mtd, rep_data
+            SELECT * FROM (
+                SELECT 
+                    'I' AS src,
+                    SalesRep AS rep_name,
+                    GLAccount,
+                    InvoiceDate >= ? AS is_today,
+                    SUM(TotalCAD) as amount
+                FROM invoiced_view
+                WHERE InvoiceDate >= ?
+                    AND InvoiceDate < ?
+                GROUP BY SalesRep, GLAccount, is_today
+
+                UNION ALL
+
+                SELECT 
+                    'B' AS src,
+                    osov.SalesRepRef_FullName,
+                    {GL_ACCOUNT_NAME} AS GLAccount,
+                    0,
+                    SUM(osov.Remainder) as amount
+                FROM {source} osov
+                -- Join to the item's income account
+                LEFT JOIN {item_account} ia ON ia.ListID = osov.ItemRef_ListID
+                LEFT JOIN accounts acc ON acc.ListID = ia.AccountListID
+                GROUP BY osov.SalesRepRef_FullName, GLAccount
+            )
+            ORDER BY COALESCE(NULLIF(rep_name, ''), 'Unassigned')
+        """, (self.today_iso, self.month_start_iso, self.tomorrow_iso) + tuple(bagged_params))
+
+        # Totals cover every rep, the per-rep figures only the selected reps
+        mtd_total = 0.0
+        bagged_total = 0.0
+        invoiced_total = 0.0
+        invoiced_by_rep = {}
+        rep_sums = {}  # display rep -> [mtd, bagged], None for a source the rep has no sales in
+        gl_invoiced = {}
+        gl_bagged = {}
+        for src, rep_name, gl_account, is_today, amount in cursor.fetchall():
+            amount = float(amount or 0)
+            selected = self.selected_rep_set is None or rep_name in self.selected_rep_set
+            # NULL and '' reps are both shown as 'Unassigned' - merge them, as the ORDER BY does
+            rep_key = rep_name or 'Unassigned'
+            if src == 'I':
+                mtd_total += amount
+                gl_invoiced[gl_account] = gl_invoiced.get(gl_account, 0) + amount
+                if is_today:
+                    invoiced_total += amount
+                    if selected:
+                        invoiced_by_rep[rep_key] = invoiced_by_rep.get(rep_key, 0) + amount
+                column = 0
+            else:
+                bagged_total += amount
+                gl_bagged[gl_account] = gl_bagged.get(gl_account, 0) + amount
+                column = 1
+
+            if selected:
+                sums = rep_sums.setdefault(rep_key, [None, None])
+                sums[column] = (sums[column] or 0) + amount
+
+        return {
+            'mtd_total': mtd_total,
+            'bagged_total': bagged_total,
+            'invoiced_total': invoiced_total,
+            'invoiced_by_rep': invoiced_by_rep,
+            'rep_rows': [(rep_key, mtd, bagged) for rep_key, (mtd, bagged) in rep_sums.items()],
+            'gl_data': self._combine_gl(gl_invoiced, gl_bagged),
+        }
 
     def save_daily_snapshot(self, bagged_total, bagged_by_rep, invoiced_total, invoiced_by_rep):
         """Save or update daily snapshot"""
-        cursor = self.conn.cursor()
-
-        # Check if record exists
-        cursor.execute("""
-            SELECT track_date FROM daily_sales_tracker 
-            WHERE track_date = DATE('now')
-        """)
-        exists = cursor.fetchone() is not None
-
-        if exists:
-            cursor.execute("""
-                UPDATE daily_sales_tracker
-                SET bagged_sales_total = ?,
-                    invoiced_sales_total = ?,
-                    bagged_by_rep = ?,
-                    invoiced_by_rep = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE track_date = DATE('now')
-            """, (bagged_total, invoiced_total,
-                  json.dumps(bagged_by_rep), json.dumps(invoiced_by_rep)))
-        else:
-            cursor.execute("""
+        # Encode the per-rep dicts before the write transaction starts, so the
+        # write lock is only held for the upsert itself
+        bagged_json = dumps_compact(bagged_by_rep)
+        invoiced_json = dumps_compact(invoiced_by_rep)
+
+        # Insert today's row, or update it in place if the report already ran today -
+        # one transaction, committed on success and rolled back on error
+        with self.conn:
+            self.conn.execute("""
                 INSERT INTO daily_sales_tracker 
                 (track_date, bagged_sales_total, invoiced_sales_total, bagged_by_rep, invoiced_by_rep)
-                VALUES (DATE('now'), ?, ?, ?, ?)
-            """, (bagged_total, invoiced_total,
-                  json.dumps(bagged_by_rep), json.dumps(invoiced_by_rep)))
-
-        self.conn.commit()
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(track_date) DO UPDATE
+                SET bagged_sales_total = excluded.bagged_sales_total,
+                    invoiced_sales_total = excluded.invoiced_sales_total,
+                    bagged_by_rep = excluded.bagged_by_rep,
+                    invoiced_by_rep = excluded.invoiced_by_rep,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (self.today_iso, bagged_total, invoiced_total, bagged_json, invoiced_json))
 
     def get_historical_data(self, days=30):
         """Get historical daily data for trend analysis"""
@@ -308,20 +483,20 @@ class GoalTrackerIII:
                 bagged_sales_total,
                 invoiced_sales_total
             FROM daily_sales_tracker
-            WHERE track_date >= DATE('now', '-' || ? || ' days')
+            WHERE track_date >= ?
             ORDER BY track_date DESC
-        """, (days,))
+        """, ((self.today - timedelta(days=days)).isoformat(),))
 
         return cursor.fetchall()
 
     def analyze_status_breakdown(self):
         """Analyze current month's orders by status for diagnostic purposes"""
         cursor = self.conn.cursor()
+        cursor.row_factory = None  # Plain tuples - no sqlite3.Row per result row
         print("\n=== DIAGNOSTIC: Current Month Status Breakdown ===")
 
         # Get the last day of current month minus 5 days
-        cursor.execute("SELECT DATE('now', 'start of month', '+1 month', '-5 days') as cutoff_date")
-        cutoff_date = cursor.fetchone()['cutoff_date']
+        cutoff_date = self.stock_wait_cutoff_iso
         print(f"Stock Wait cutoff date (5 days before month end): {cutoff_date}")
 
         cursor.execute("""
@@ -331,402 +506,72 @@ class GoalTrackerIII:
                 SUM(Remainder) as total_value,
                 SUM(CASE 
                     WHEN CustomField_Line_Line_Status = 'Stock Wait' 
-                         AND DATE(CustomField_Line_Promised_Date) >= DATE('now', 'start of month', '+1 month', '-5 days')
+                         AND CustomField_Line_Promised_Date >= ?
                     THEN Remainder 
                     ELSE 0 
                 END) as excluded_stock_wait,
+                -- Share of the month's total, summed over the groups with a window
+                -- function instead of scanning the view a second time
                 printf('%.1f%%', (SUM(Remainder) * 100.0 / 
-                    (SELECT SUM(Remainder) FROM open_sales_orders_view 
-                     WHERE DATE(CustomField_Line_Promised_Date) <= DATE('now', 'start of month', '+1 month', '-1 day')
-                     AND DATE(CustomField_Line_Promised_Date) >= DATE('now')))) as pct_of_month
+                    SUM(SUM(Remainder)) OVER ())) as pct_of_month
             FROM open_sales_orders_view
-            WHERE DATE(CustomField_Line_Promised_Date) <= DATE('now', 'start of month', '+1 month', '-1 day')
-                AND DATE(CustomField_Line_Promised_Date) >= DATE('now')
+            WHERE CustomField_Line_Promised_Date < ?
+                AND CustomField_Line_Promised_Date >= ?
             GROUP BY CustomField_Line_Line_Status
             ORDER BY total_value DESC
-        """)
+        """, (self.stock_wait_cutoff_iso, self.next_month_start_iso, self.today_iso))
 
         print(f"\n{'Status':<15} {'Count':>6} {'Value':>12} {'Excluded':>12} {'% of Month':>10}")
         print("-" * 65)
-        for row in cursor.fetchall():
-            status = row['status'] or 'None'
-            excluded = f"${row['excluded_stock_wait']:,.0f}" if row['excluded_stock_wait'] > 0 else "-"
+        for status, count, total_value, excluded_stock_wait, pct_of_month in cursor.fetchall():
+            status = status or 'None'
+            excluded = f"${excluded_stock_wait:,.0f}" if excluded_stock_wait > 0 else "-"
             print(
-                f"{status:<15} {row['count']:>6} ${row['total_value']:>11,.0f} {excluded:>12} {row['pct_of_month']:>10}")
+                f"{status:<15} {count:>6} ${total_value:>11,.0f} {excluded:>12} {pct_of_month:>10}")
 
         print(
             "\nNote: Stock Wait orders with promised dates in the last 5 days of the month are excluded from bagged sales.")
         print("=" * 65)
 
     def format_currency(self, amount):
-        """Format number as currency"""
-        return f"${amount:,.2f}"
+        """Format number as currency (the report calls CURRENCY_FORMAT directly)"""
+        return CURRENCY_FORMAT(amount)
+
+    @staticmethod
+    def _remove_temp_file(path):
+        """Best-effort cleanup of a partially written temp file"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
     def generate_pdf_report(self, output_path='goal_tracker_report.pdf'):
         """Generate the PDF report with file lock handling"""
-        # Get all data
-        bagged_total, bagged_by_rep = self.get_bagged_sales()
-        invoiced_total, invoiced_by_rep = self.get_invoiced_sales_today()
-        mtd_total, mtd_by_rep = self.get_month_to_date_sales()
+        # ReportLab is only imported once a report is actually built
+        from reportlab.lib import colors
+        from reportlab.platypus import Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak, KeepTogether
+        from reportlab.lib.units import inch
+        from reportlab.graphics.shapes import Drawing, Rect, String
+
+        report_style = report_styles()
+
+        # Get all data - one transaction for the bagged lines and the combined
+        # totals query, so every table reflects the same point in time and the
+        # WAL read snapshot is taken once
+        with self.conn:
+            self.conn.execute("BEGIN")
+            bagged_table = self.materialize_bagged_rows()
+            totals = self._load_all_totals(bagged_table)
         monthly_target = self.get_monthly_target()
 
-        # Calculate month progress based on BUSINESS DAYS
-        business_days_total = self.get_business_days_in_month()
-        business_days_elapsed = self.get_business_days_elapsed()
-        month_progress = (business_days_elapsed / business_days_total) * 100 if business_days_total > 0 else 0
-
-        # Calculate projected total and gap
-        projected_total = mtd_total + bagged_total
-        gap_to_target = monthly_target - projected_total
-
-        # Performance index: goal progress / time progress
-        goal_progress = (projected_total / monthly_target * 100) if monthly_target > 0 else 0
-        performance_index = (goal_progress / month_progress) if month_progress > 0 else 0
-
-        # Save snapshot if business day
-        if self.is_business_day(self.today):
-            self.save_daily_snapshot(bagged_total, bagged_by_rep, invoiced_total, invoiced_by_rep)
-
-        # Try to create PDF with file lock handling
-        final_output_path = output_path
-        attempt = 0
-        max_attempts = 5
-
-        while attempt < max_attempts:
-            try:
-                # Create PDF
-                doc = SimpleDocTemplate(final_output_path, pagesize=landscape(letter))
-                story = []
-                styles = getSampleStyleSheet()
-
-                # Title
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=24,
-                    textColor=colors.HexColor('#1f4788'),
-                    spaceAfter=30,
-                    alignment=1  # Center
-                )
-                story.append(Paragraph(f"Goal Tracker III - Daily Sales Report", title_style))
-                story.append(Paragraph(f"{self.today.strftime('%B %d, %Y')}", styles['Normal']))
-                story.append(Spacer(1, 0.5 * inch))
-
-                # Progress indicators
-                progress_data = [
-                    ['Business Days Progress',
-                     f"{business_days_elapsed}/{business_days_total} days ({month_progress:.1f}%)"],
-                    ['Performance Index', f"{performance_index:.2f}" + (" 🟢" if performance_index >= 1.0 else " 🔴")],
-                ]
-
-                progress_table = Table(progress_data, colWidths=[2.5 * inch, 2.5 * inch])
-                progress_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, -1), colors.lightyellow),
-                    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 11),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-                ]))
-                story.append(progress_table)
-                story.append(Spacer(1, 0.3 * inch))
-
-                # Summary metrics with Gap
-                summary_data = [
-                    ['Metric', 'Amount', 'Progress'],
-                    ['Monthly Target', self.format_currency(monthly_target), ''],
-                    ['MTD Invoiced Sales', self.format_currency(mtd_total),
-                     f"{(mtd_total / monthly_target * 100):.1f}%" if monthly_target > 0 else "N/A"],
-                    ['Bagged Sales (Month-End)', self.format_currency(bagged_total), ''],
-                    ['Projected Month Total', self.format_currency(projected_total),
-                     f"{(projected_total / monthly_target * 100):.1f}%" if monthly_target > 0 else "N/A"],
-                    ['Gap to Target', self.format_currency(abs(gap_to_target)),
-                     "OVER TARGET!" if gap_to_target < 0 else "SHORT"],
-                    ['Today\'s Invoiced', self.format_currency(invoiced_total), '']
-                ]
-
-                summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch, 1.5 * inch])
-                summary_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                    # Highlight the gap row
-                    ('BACKGROUND', (0, 5), (-1, 5), colors.lightcoral if gap_to_target > 0 else colors.lightgreen),
-                    ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
-                ]))
-                story.append(summary_table)
-                story.append(Spacer(1, 0.5 * inch))
-
-                # Visual Progress Bar
-                drawing = Drawing(600, 50)
-
-                # Background bar
-                bar_width = 500
-                bar_height = 30
-                bar_x = 50
-                bar_y = 10
-
-                # Background
-                drawing.add(Rect(bar_x, bar_y, bar_width, bar_height,
-                                 fillColor=colors.lightgrey, strokeColor=colors.black))
-
-                # Progress bar (goal progress)
-                progress_width = min(bar_width * (goal_progress / 100), bar_width)
-                progress_color = colors.green if goal_progress >= month_progress else colors.orange
-                drawing.add(Rect(bar_x, bar_y, progress_width, bar_height,
-                                 fillColor=progress_color, strokeColor=None))
-
-                # Month progress line (vertical line showing where we should be)
-                month_line_x = bar_x + (bar_width * month_progress / 100)
-                drawing.add(Rect(month_line_x - 2, bar_y - 5, 4, bar_height + 10,
-                                 fillColor=colors.red, strokeColor=None))
-
-                # Labels
-                drawing.add(String(bar_x + progress_width / 2, bar_y + bar_height / 2,
-                                   f"Sales: {goal_progress:.1f}%",
-                                   fontSize=12, fillColor=colors.white, textAnchor='middle'))
-                drawing.add(String(month_line_x, bar_y - 10,
-                                   f"Day {business_days_elapsed} of {business_days_total}",
-                                   fontSize=10, fillColor=colors.red, textAnchor='middle'))
-
-                story.append(drawing)
-                story.append(Spacer(1, 0.2 * inch))
-
-                # Add dynamic performance explanation
-                perf_explanation_style = ParagraphStyle(
-                    'PerfExplanation',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    textColor=colors.HexColor('#444444'),
-                    alignment=1,  # Center
-                    spaceAfter=20
-                )
-
-                # Create dynamic explanation based on performance
-                if performance_index >= 1.0:
-                    perf_status = "ahead of schedule"
-                    perf_color = "green"
-                    perf_emoji = "✅"
-                    perf_detail = f"You're {(performance_index - 1) * 100:.1f}% ahead of where you need to be!"
-                else:
-                    perf_status = "behind schedule"
-                    perf_color = "orange"
-                    perf_emoji = "⚠️"
-                    deficit_percent = (1 - performance_index) * 100
-                    perf_detail = f"You need to pick up the pace by {deficit_percent:.1f}% to meet your goal."
-
-                explanation_text = (
-                    f"<b>Performance Index: {performance_index:.2f}</b> {perf_emoji}<br/>"
-                    f"You are {business_days_elapsed} business days into the month (out of {business_days_total} total). "
-                    f"This represents {month_progress:.1f}% of available selling days.<br/>"
-                    f"Your sales progress ({goal_progress:.1f}%) is <font color='{perf_color}'>{perf_status}</font>. "
-                    f"{perf_detail}"
-                )
-
-                story.append(Paragraph(explanation_text, perf_explanation_style))
-                story.append(Spacer(1, 0.3 * inch))
-
-                # Sales by Rep - MTD (Keep together with its table)
-                rep_section = []
-                rep_heading_style = ParagraphStyle(
-                    'RepHeading',
-                    parent=styles['Heading2'],
-                    keepWithNext=True,  # This keeps the heading with the table
-                    spaceAfter=12
-                )
-                rep_section.append(Paragraph("Month-to-Date Sales by Representative", rep_heading_style))
-
-                # Combine all reps
-                all_reps = set(mtd_by_rep.keys()) | set(bagged_by_rep.keys())
-                rep_data = [['Sales Rep', 'MTD Invoiced', 'Bagged Sales', 'Projected Total']]
-
-                for rep in sorted(all_reps):
-                    mtd = mtd_by_rep.get(rep, 0)
-                    bagged = bagged_by_rep.get(rep, 0)
-                    rep_data.append([
-                        rep,
-                        self.format_currency(mtd),
-                        self.format_currency(bagged),
-                        self.format_currency(mtd + bagged)
-                    ])
-
-                # Add totals row
-                rep_data.append([
-                    'TOTAL',
-                    self.format_currency(mtd_total),
-                    self.format_currency(bagged_total),
-                    self.format_currency(mtd_total + bagged_total)
-                ])
-
-                rep_table = Table(rep_data, colWidths=[3 * inch, 2 * inch, 2 * inch, 2 * inch])
-                rep_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ]))
-
-                # Use KeepTogether to prevent splitting
-                from reportlab.platypus import KeepTogether
-                story.append(KeepTogether([
-                    Paragraph("Month-to-Date Sales by Representative", rep_heading_style),
-                    rep_table
-                ]))
-
-                story.append(Spacer(1, 0.4 * inch))
-
-                # Sales by GL Account (also keep together)
-                gl_heading_style = ParagraphStyle(
-                    'GLHeading',
-                    parent=styles['Heading2'],
-                    keepWithNext=True,
-                    spaceAfter=12
-                )
-
-                gl_data = self.get_sales_by_gl_account()
-                if gl_data:
-                    gl_elements = []
-                    gl_elements.append(Paragraph("Sales by GL Account", gl_heading_style))
-
-                    gl_table_data = [['GL Account', 'MTD Invoiced', 'Bagged Sales', 'Total']]
-
-                    # Sort by total descending
-                    gl_data.sort(key=lambda x: x['total'], reverse=True)
-
-                    total_invoiced_gl = 0
-                    total_bagged_gl = 0
-
-                    # Limit to top 15 GL accounts to fit on page
-                    display_limit = 15
-                    other_invoiced = 0
-                    other_bagged = 0
-
-                    for i, gl in enumerate(gl_data):
-                        if i < display_limit:
-                            gl_table_data.append([
-                                gl['gl_account'][:50] + '...' if len(gl['gl_account']) > 50 else gl['gl_account'],
-                                self.format_currency(gl['invoiced']),
-                                self.format_currency(gl['bagged']),
-                                self.format_currency(gl['total'])
-                            ])
-                        else:
-                            other_invoiced += gl['invoiced']
-                            other_bagged += gl['bagged']
-
-                        total_invoiced_gl += gl['invoiced']
-                        total_bagged_gl += gl['bagged']
-
-                    # Add "Other accounts" row if needed
-                    if len(gl_data) > display_limit:
-                        gl_table_data.append([
-                            f'Other ({len(gl_data) - display_limit} accounts)',
-                            self.format_currency(other_invoiced),
-                            self.format_currency(other_bagged),
-                            self.format_currency(other_invoiced + other_bagged)
-                        ])
-
-                    # Add totals row
-                    gl_table_data.append([
-                        'TOTAL',
-                        self.format_currency(total_invoiced_gl),
-                        self.format_currency(total_bagged_gl),
-                        self.format_currency(total_invoiced_gl + total_bagged_gl)
-                    ])
-
-                    gl_table = Table(gl_table_data, colWidths=[3.5 * inch, 2 * inch, 2 * inch, 2 * inch])
-                    gl_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 11),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                        ('FONTSIZE', (0, 1), (0, -2), 9),  # Smaller font for GL account names
-                    ]))
-
-                    gl_elements.append(gl_table)
-
-                    # Keep GL section together
-                    story.append(KeepTogether(gl_elements))
-                else:
-                    story.append(Paragraph("No GL Account data available.", styles['Normal']))
-
-                # Add page break
-                story.append(PageBreak())
-
-                # Today's activity by rep
-                story.append(Paragraph("Today's Invoiced Sales by Representative", styles['Heading2']))
-
-                if invoiced_by_rep:
-                    today_data = [['Sales Rep', 'Amount']]
-                    for rep, amount in sorted(invoiced_by_rep.items(), key=lambda x: x[1], reverse=True):
-                        today_data.append([rep, self.format_currency(amount)])
-                    today_data.append(['TOTAL', self.format_currency(invoiced_total)])
-
-                    today_table = Table(today_data, colWidths=[3 * inch, 2 * inch])
-                    today_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 11),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                    ]))
-                    story.append(today_table)
-                else:
-                    story.append(Paragraph("No sales invoiced today.", styles['Normal']))
-
-                # Build PDF
-                doc.build(story)
-                print(f"Report generated: {final_output_path}")
-                return final_output_path
-
-            except PermissionError as e:
-                # File is locked, try alternative name
-                attempt += 1
-                if attempt >= max_attempts:
-                    # Final attempt: use timestamp
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    final_output_path = f"Goal_Tracker_{timestamp}.pdf"
-                else:
-                    # Try numbered alternatives
-                    base_name = os.path.splitext(output_path)[0]
-                    final_output_path = f"{base_name}_{attempt}.pdf"
-
-                print(f"File locked, trying: {final_output_path}")
-                continue
+        mtd_total = totals['mtd_total']
+        bagged_total = totals['bagged_total']
+        invoiced_total = totals['invoiced_total']
+        invoiced_by_rep = totals['invoiced_by_rep']
+        rep_rows = totals['rep_rows']
+        gl_data = totals['gl_data']
 
-            except Exception as e:
-                print(f"Error generating PDF: {e}")
-                raise
-
-        # If we get here, all attempts failed
-        raise Exception(f"Could not generate PDF after {max_attempts} attempts")
-        """Generate the PDF report"""
-        # Get all data
-        bagged_total, bagged_by_rep = self.get_bagged_sales()
-        invoiced_total, invoiced_by_rep = self.get_invoiced_sales_today()
-        mtd_total, mtd_by_rep = self.get_month_to_date_sales()
-        monthly_target = self.get_monthly_target()
+        bagged_by_rep = {rep: bagged for rep, _, bagged in rep_rows if bagged is not None}
 
         # Calculate month progress based on BUSINESS DAYS
         business_days_total = self.get_business_days_in_month()
@@ -745,70 +590,55 @@ class GoalTrackerIII:
         if self.is_business_day(self.today):
             self.save_daily_snapshot(bagged_total, bagged_by_rep, invoiced_total, invoiced_by_rep)
 
-        # Create PDF
-        doc = SimpleDocTemplate(output_path, pagesize=landscape(letter))
+        # Lay out the report
         story = []
-        styles = getSampleStyleSheet()
+        styles = report_style['sample']
 
         # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1f4788'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        story.append(Paragraph(f"Goal Tracker III - Daily Sales Report", title_style))
+        story.append(Paragraph(f"Goal Tracker III - Daily Sales Report", report_style['title']))
         story.append(Paragraph(f"{self.today.strftime('%B %d, %Y')}", styles['Normal']))
         story.append(Spacer(1, 0.5 * inch))
 
+        # Nothing to report (e.g. an off-hours run early in the month) - skip the
+        # tables and progress bar and write a one-page notice instead
+        if not any((mtd_total, bagged_total, invoiced_total, rep_rows, gl_data)):
+            story.append(Paragraph("No sales activity recorded this month.", styles['Normal']))
+            return self._write_pdf(story, output_path)
+
         # Progress indicators
         progress_data = [
-            ['Business Days Progress', f"{business_days_elapsed}/{business_days_total} days ({month_progress:.1f}%)"],
+            ['Business Days Progress',
+             f"{business_days_elapsed}/{business_days_total} days ({month_progress:.1f}%)"],
             ['Performance Index', f"{performance_index:.2f}" + (" 🟢" if performance_index >= 1.0 else " 🔴")],
         ]
 
-        progress_table = Table(progress_data, colWidths=[2.5 * inch, 2.5 * inch])
-        progress_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightyellow),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ]))
+        progress_table = Table(progress_data, colWidths=[2.5 * inch, 2.5 * inch],
+                               rowHeights=table_row_heights(progress_data, header=False))
+        progress_table.setStyle(report_style['progress_table'])
         story.append(progress_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # Summary metrics with Gap
         summary_data = [
             ['Metric', 'Amount', 'Progress'],
-            ['Monthly Target', self.format_currency(monthly_target), ''],
-            ['MTD Invoiced Sales', self.format_currency(mtd_total),
+            ['Monthly Target', CURRENCY_FORMAT(monthly_target), ''],
+            ['MTD Invoiced Sales', CURRENCY_FORMAT(mtd_total),
              f"{(mtd_total / monthly_target * 100):.1f}%" if monthly_target > 0 else "N/A"],
-            ['Bagged Sales (Month-End)', self.format_currency(bagged_total), ''],
-            ['Projected Month Total', self.format_currency(projected_total),
+            ['Bagged Sales (Month-End)', CURRENCY_FORMAT(bagged_total), ''],
+            ['Projected Month Total', CURRENCY_FORMAT(projected_total),
              f"{(projected_total / monthly_target * 100):.1f}%" if monthly_target > 0 else "N/A"],
-            ['Gap to Target', self.format_currency(abs(gap_to_target)),
+            ['Gap to Target', CURRENCY_FORMAT(abs(gap_to_target)),
              "OVER TARGET!" if gap_to_target < 0 else "SHORT"],
-            ['Today\'s Invoiced', self.format_currency(invoiced_total), '']
+            ['Today\'s Invoiced', CURRENCY_FORMAT(invoiced_total), '']
         ]
 
-        summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch, 1.5 * inch])
+        summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch, 1.5 * inch],
+                              rowHeights=table_row_heights(summary_data))
         summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
             # Highlight the gap row
             ('BACKGROUND', (0, 5), (-1, 5), colors.lightcoral if gap_to_target > 0 else colors.lightgreen),
             ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
-        ]))
+        ], parent=report_style['summary_table']))
         story.append(summary_table)
         story.append(Spacer(1, 0.5 * inch))
 
@@ -820,43 +650,35 @@ class GoalTrackerIII:
         bar_height = 30
         bar_x = 50
         bar_y = 10
+        bar_mid_y = bar_y + bar_height / 2
+        add_shape = drawing.add
 
         # Background
-        drawing.add(Rect(bar_x, bar_y, bar_width, bar_height,
-                         fillColor=colors.lightgrey, strokeColor=colors.black))
+        add_shape(Rect(bar_x, bar_y, bar_width, bar_height,
+                       fillColor=colors.lightgrey, strokeColor=colors.black))
 
         # Progress bar (goal progress)
         progress_width = min(bar_width * (goal_progress / 100), bar_width)
         progress_color = colors.green if goal_progress >= month_progress else colors.orange
-        drawing.add(Rect(bar_x, bar_y, progress_width, bar_height,
-                         fillColor=progress_color, strokeColor=None))
+        add_shape(Rect(bar_x, bar_y, progress_width, bar_height,
+                       fillColor=progress_color, strokeColor=None))
 
         # Month progress line (vertical line showing where we should be)
         month_line_x = bar_x + (bar_width * month_progress / 100)
-        drawing.add(Rect(month_line_x - 2, bar_y - 5, 4, bar_height + 10,
-                         fillColor=colors.red, strokeColor=None))
+        add_shape(Rect(month_line_x - 2, bar_y - 5, 4, bar_height + 10,
+                       fillColor=colors.red, strokeColor=None))
 
         # Labels
-        drawing.add(String(bar_x + progress_width / 2, bar_y + bar_height / 2,
-                           f"Sales: {goal_progress:.1f}%",
-                           fontSize=12, fillColor=colors.white, textAnchor='middle'))
-        drawing.add(String(month_line_x, bar_y - 10,
-                           f"Day {business_days_elapsed} of {business_days_total}",
-                           fontSize=10, fillColor=colors.red, textAnchor='middle'))
+        add_shape(String(bar_x + progress_width / 2, bar_mid_y,
+                         f"Sales: {goal_progress:.1f}%",
+                         fontSize=12, fillColor=colors.white, textAnchor='middle'))
+        add_shape(String(month_line_x, bar_y - 10,
+                         f"Day {business_days_elapsed} of {business_days_total}",
+                         fontSize=10, fillColor=colors.red, textAnchor='middle'))
 
         story.append(drawing)
         story.append(Spacer(1, 0.2 * inch))
 
-        # Add dynamic performance explanation
-        perf_explanation_style = ParagraphStyle(
-            'PerfExplanation',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#444444'),
-            alignment=1,  # Center
-            spaceAfter=20
-        )
-
         # Create dynamic explanation based on performance
         if performance_index >= 1.0:
             perf_status = "ahead of schedule"
@@ -878,136 +700,85 @@ class GoalTrackerIII:
             f"{perf_detail}"
         )
 
-        story.append(Paragraph(explanation_text, perf_explanation_style))
+        story.append(Paragraph(explanation_text, report_style['perf_explanation']))
         story.append(Spacer(1, 0.3 * inch))
 
         # Sales by Rep - MTD (Keep together with its table)
-        rep_section = []
-        rep_heading_style = ParagraphStyle(
-            'RepHeading',
-            parent=styles['Heading2'],
-            keepWithNext=True,  # This keeps the heading with the table
-            spaceAfter=12
-        )
-        rep_section.append(Paragraph("Month-to-Date Sales by Representative", rep_heading_style))
-
-        # Combine all reps
-        all_reps = set(mtd_by_rep.keys()) | set(bagged_by_rep.keys())
+        # One row per rep (already merged and ordered by _load_all_totals)
         rep_data = [['Sales Rep', 'MTD Invoiced', 'Bagged Sales', 'Projected Total']]
-
-        for rep in sorted(all_reps):
-            mtd = mtd_by_rep.get(rep, 0)
-            bagged = bagged_by_rep.get(rep, 0)
-            rep_data.append([
-                rep,
-                self.format_currency(mtd),
-                self.format_currency(bagged),
-                self.format_currency(mtd + bagged)
-            ])
+        rep_data += [
+            [rep, CURRENCY_FORMAT(mtd or 0), CURRENCY_FORMAT(bagged or 0),
+             CURRENCY_FORMAT((mtd or 0) + (bagged or 0))]
+            for rep, mtd, bagged in rep_rows
+        ]
 
         # Add totals row
         rep_data.append([
             'TOTAL',
-            self.format_currency(mtd_total),
-            self.format_currency(bagged_total),
-            self.format_currency(mtd_total + bagged_total)
+            CURRENCY_FORMAT(mtd_total),
+            CURRENCY_FORMAT(bagged_total),
+            CURRENCY_FORMAT(mtd_total + bagged_total)
         ])
 
-        rep_table = Table(rep_data, colWidths=[3 * inch, 2 * inch, 2 * inch, 2 * inch])
-        rep_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ]))
+        # LongTable for the tables that grow with the rep / GL account lists -
+        # it skips re-measuring every row when a table is split across pages
+        rep_table = LongTable(rep_data, colWidths=[3 * inch, 2 * inch, 2 * inch, 2 * inch],
+                              rowHeights=table_row_heights(rep_data))
+        rep_table.setStyle(report_style['totals_table'])
 
         # Use KeepTogether to prevent splitting
-        from reportlab.platypus import KeepTogether
         story.append(KeepTogether([
-            Paragraph("Month-to-Date Sales by Representative", rep_heading_style),
+            Paragraph("Month-to-Date Sales by Representative", report_style['section_heading']),
             rep_table
         ]))
 
         story.append(Spacer(1, 0.4 * inch))
 
         # Sales by GL Account (also keep together)
-        gl_heading_style = ParagraphStyle(
-            'GLHeading',
-            parent=styles['Heading2'],
-            keepWithNext=True,
-            spaceAfter=12
-        )
-
-        gl_data = self.get_sales_by_gl_account()
         if gl_data:
             gl_elements = []
-            gl_elements.append(Paragraph("Sales by GL Account", gl_heading_style))
+            gl_elements.append(Paragraph("Sales by GL Account", report_style['section_heading']))
 
             gl_table_data = [['GL Account', 'MTD Invoiced', 'Bagged Sales', 'Total']]
 
-            # Sort by total descending
-            gl_data.sort(key=lambda x: x['total'], reverse=True)
+            total_invoiced_gl = sum(gl.invoiced for gl in gl_data)
+            total_bagged_gl = sum(gl.bagged for gl in gl_data)
 
-            total_invoiced_gl = 0
-            total_bagged_gl = 0
-
-            # Limit to top 15 GL accounts to fit on page
+            # Limit to top 15 GL accounts by total to fit on page - nlargest picks
+            # them (in sorted order, ties as sort would) without sorting every account
             display_limit = 15
-            other_invoiced = 0
-            other_bagged = 0
-
-            for i, gl in enumerate(gl_data):
-                if i < display_limit:
-                    gl_table_data.append([
-                        gl['gl_account'][:50] + '...' if len(gl['gl_account']) > 50 else gl['gl_account'],
-                        self.format_currency(gl['invoiced']),
-                        self.format_currency(gl['bagged']),
-                        self.format_currency(gl['total'])
-                    ])
-                else:
-                    other_invoiced += gl['invoiced']
-                    other_bagged += gl['bagged']
-
-                total_invoiced_gl += gl['invoiced']
-                total_bagged_gl += gl['bagged']
+            shown_gl = heapq.nlargest(display_limit, gl_data, key=operator.attrgetter('total'))
+            shown_ids = {id(gl) for gl in shown_gl}
+            other_gl = [gl for gl in gl_data if id(gl) not in shown_ids]
+            other_invoiced = sum(gl.invoiced for gl in other_gl)
+            other_bagged = sum(gl.bagged for gl in other_gl)
+
+            gl_table_data += [
+                [gl.gl_account[:50] + '...' if len(gl.gl_account) > 50 else gl.gl_account,
+                 CURRENCY_FORMAT(gl.invoiced), CURRENCY_FORMAT(gl.bagged), CURRENCY_FORMAT(gl.total)]
+                for gl in shown_gl
+            ]
 
             # Add "Other accounts" row if needed
-            if len(gl_data) > display_limit:
+            if other_gl:
                 gl_table_data.append([
-                    f'Other ({len(gl_data) - display_limit} accounts)',
-                    self.format_currency(other_invoiced),
-                    self.format_currency(other_bagged),
-                    self.format_currency(other_invoiced + other_bagged)
+                    f'Other ({len(other_gl)} accounts)',
+                    CURRENCY_FORMAT(other_invoiced),
+                    CURRENCY_FORMAT(other_bagged),
+                    CURRENCY_FORMAT(other_invoiced + other_bagged)
                 ])
 
             # Add totals row
             gl_table_data.append([
                 'TOTAL',
-                self.format_currency(total_invoiced_gl),
-                self.format_currency(total_bagged_gl),
-                self.format_currency(total_invoiced_gl + total_bagged_gl)
+                CURRENCY_FORMAT(total_invoiced_gl),
+                CURRENCY_FORMAT(total_bagged_gl),
+                CURRENCY_FORMAT(total_invoiced_gl + total_bagged_gl)
             ])
 
-            gl_table = Table(gl_table_data, colWidths=[3.5 * inch, 2 * inch, 2 * inch, 2 * inch])
-            gl_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ('FONTSIZE', (0, 1), (0, -2), 9),  # Smaller font for GL account names
-            ]))
+            gl_table = LongTable(gl_table_data, colWidths=[3.5 * inch, 2 * inch, 2 * inch, 2 * inch],
+                                 rowHeights=table_row_heights(gl_table_data))
+            gl_table.setStyle(report_style['gl_table'])
 
             gl_elements.append(gl_table)
 
@@ -1024,32 +795,71 @@ class GoalTrackerIII:
 
         if invoiced_by_rep:
             today_data = [['Sales Rep', 'Amount']]
-            for rep, amount in sorted(invoiced_by_rep.items(), key=lambda x: x[1], reverse=True):
-                today_data.append([rep, self.format_currency(amount)])
-            today_data.append(['TOTAL', self.format_currency(invoiced_total)])
-
-            today_table = Table(today_data, colWidths=[3 * inch, 2 * inch])
-            today_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-            ]))
+            today_data += [
+                [rep, CURRENCY_FORMAT(amount)]
+                for rep, amount in sorted(invoiced_by_rep.items(), key=operator.itemgetter(1), reverse=True)
+            ]
+            today_data.append(['TOTAL', CURRENCY_FORMAT(invoiced_total)])
+
+            today_table = LongTable(today_data, colWidths=[3 * inch, 2 * inch],
+                                    rowHeights=table_row_heights(today_data))
+            today_table.setStyle(report_style['totals_table'])
             story.append(today_table)
         else:
             story.append(Paragraph("No sales invoiced today.", styles['Normal']))
 
-        # Build PDF
+        return self._write_pdf(story, output_path)
+
+    def _write_pdf(self, story, output_path):
+        """Build the story into a PDF and write it, retrying under another name if the file is locked"""
+        from reportlab.lib.pagesizes import letter, landscape
+        from reportlab.platypus import SimpleDocTemplate
+
+        # Build the PDF once in memory - only writing it out is retried when the
+        # output file is locked (e.g. still open in a PDF viewer)
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
         doc.build(story)
-        print(f"Report generated: {output_path}")
+        pdf_bytes = buffer.getvalue()
+
+        final_output_path = output_path
+        attempt = 0
+        max_attempts = 5
+
+        while attempt < max_attempts:
+            # Write a sibling temp file and swap it in, so the report is never half-written
+            temp_path = f"{final_output_path}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(temp_path, final_output_path)
+                print(f"Report generated: {final_output_path}")
+                return final_output_path
+
+            except PermissionError as e:
+                self._remove_temp_file(temp_path)
 
-        return output_path
+                # File is locked, try alternative name
+                attempt += 1
+                if attempt >= max_attempts:
+                    # Final attempt: use timestamp
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    final_output_path = f"Goal_Tracker_{timestamp}.pdf"
+                else:
+                    # Try numbered alternatives
+                    base_name = os.path.splitext(output_path)[0]
+                    final_output_path = f"{base_name}_{attempt}.pdf"
+
+                print(f"File locked, trying: {final_output_path}")
+                continue
+
+            except Exception as e:
+                self._remove_temp_file(temp_path)
+                print(f"Error writing PDF: {e}")
+                raise
+
+        # If we get here, all attempts failed
+        raise Exception(f"Could not write PDF after {max_attempts} attempts")
 
     def get_all_reps(self):
         """Get list of all sales reps in the system"""
@@ -1068,37 +878,17 @@ class GoalTrackerIII:
 
     def get_business_days_in_month(self):
         """Calculate total business days in current month"""
-        import calendar
-        year = self.today.year
-        month = self.today.month
-
-        # Get first and last day of month
-        first_day = date(year, month, 1)
-        last_day = date(year, month, calendar.monthrange(year, month)[1])
-
-        # Count business days using timedelta for proper date arithmetic
-        business_days = 0
-        current = first_day
-        while current <= last_day:
-            if self.is_business_day(current):
-                business_days += 1
-            current += timedelta(days=1)  # Use timedelta for safe date increment
-
-        return business_days
+        if self._business_days_total is None:
+            self._business_days_total = self.count_business_days(self.month_start, self.next_month_start)
+        return self._business_days_total
 
     def get_business_days_elapsed(self):
         """Calculate business days elapsed in current month"""
-        first_day = date(self.today.year, self.today.month, 1)
-
-        # Count business days from start of month to today
-        business_days = 0
-        current = first_day
-        while current <= self.today:
-            if self.is_business_day(current):
-                business_days += 1
-            current += timedelta(days=1)  # Use timedelta for safe date increment
-
-        return business_days
+        # Count business days from start of month to today, inclusive
+        if self._business_days_elapsed is None:
+            self._business_days_elapsed = self.count_business_days(self.month_start,
+                                                                   self.today + timedelta(days=1))
+        return self._business_days_elapsed
 
     def close(self):
         """Close database connection"""
@@ -1134,8 +924,11 @@ if __name__ == "__main__":
             # Default if no config
             SELECTED_REPS = ['AL', 'CL', 'GM', 'HA', 'KG', 'PC', 'YD']
 
+    # Open the database once - the tracker's connection also creates the tables
+    tracker = GoalTrackerIII(DB_PATH, selected_reps=SELECTED_REPS)
+
     # Create tables if they don't exist
-    conn = sqlite3.connect(DB_PATH)
+    conn = tracker.conn
     cursor = conn.cursor()
 
     # Create tracking table
@@ -1178,10 +971,8 @@ if __name__ == "__main__":
         pass  # Schema might already exist
 
     conn.commit()
-    conn.close()
 
     # Generate report
-    tracker = GoalTrackerIII(DB_PATH, selected_reps=SELECTED_REPS)
     try:
         # Show available reps if needed
         print("\nAvailable Sales Reps:")
@@ -1192,8 +983,9 @@ if __name__ == "__main__":
         else:
             print("  No sales reps found in the database.")
 
-        # Show diagnostic info first
-        tracker.analyze_status_breakdown()
+        # Show diagnostic info first - only when asked for, it is not part of the report
+        if os.environ.get('GOAL_TRACKER_DIAGNOSTICS') == '1':
+            tracker.analyze_status_breakdown()
 
         # Generate the PDF report
         tracker.generate_pdf_report(OUTPUT_PATH)
@@ -3,8 +3,13 @@ QuickBooks Sync Configuration Module
 Provides all configuration settings with optional override capability
 """
 import os
-import json
-from pathlib import Path
+from collections import namedtuple
+
+# Override file parser - orjson when installed, else the stdlib parser
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Default configuration (hardcoded)
 DEFAULT_CONFIG = {
@@ -49,13 +54,19 @@ DEFAULT_CONFIG = {
 }
 
 def deep_merge(base_dict, override_dict):
-    """Recursively merge override_dict into base_dict"""
+    """Merge override_dict into a copy of base_dict - nested dicts are merged with an
+    explicit stack, and only the dicts an override actually reaches are copied"""
     result = base_dict.copy()
-    for key, value in override_dict.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = deep_merge(result[key], value)
-        else:
-            result[key] = value
+    stack = [(result, override_dict)]
+    while stack:
+        target, overrides = stack.pop()
+        for key, value in overrides.items():
+            current = target.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                target[key] = current = current.copy()
+                stack.append((current, value))
+            else:
+                target[key] = value
     return result
 
 # Load configuration
@@ -63,34 +74,40 @@ def load_config():
     """Load configuration with optional overrides from JSON file"""
     config = DEFAULT_CONFIG.copy()
 
-    # Check for override file
+    # Check for override file - a missing file is the normal no-override case
     config_file = os.environ.get('QBSYNC_CONFIG', 'qbsync_config.json')
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, 'r') as f:
-                overrides = json.load(f)
-                config = deep_merge(config, overrides)
-                print(f"Loaded configuration overrides from {config_file}")
-        except Exception as e:
-            print(f"Warning: Could not load config file {config_file}: {e}")
+    try:
+        with open(config_file, 'rb') as f:
+            overrides = json_loads(f.read())
+            config = deep_merge(config, overrides)
+            print(f"Loaded configuration overrides from {config_file}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not load config file {config_file}: {e}")
 
     return config
 
-# Load config on module import
-CONFIG = load_config()
+# Individual config sections exported for convenience
+CONFIG_SECTIONS = {
+    'DATABASE_CONFIG': 'database',
+    'QB_CONFIG': 'quickbooks',
+    'LOGGING_CONFIG': 'logging',
+    'SYNC_CONFIG': 'sync'
+}
 
-# Export individual config sections for convenience
-DATABASE_CONFIG = CONFIG['database']
-QB_CONFIG = CONFIG['quickbooks']
-LOGGING_CONFIG = CONFIG['logging']
-SYNC_CONFIG = CONFIG['sync']
+def __getattr__(name):
+    """Load CONFIG and its sections on first access (PEP 562), so importing only
+    TABLE_CONFIGS or SYNC_SCHEDULE_DEFAULTS never reads the override file"""
+    if name != 'CONFIG' and name not in CONFIG_SECTIONS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Ensure directory for database exists (SQLite only)
-if DATABASE_CONFIG['type'] == 'sqlite':
-    db_path = Path(DATABASE_CONFIG['sqlite']['path'])
-    db_dir = db_path.parent
-    if not db_dir.exists():
-        db_dir.mkdir(parents=True, exist_ok=True)
+    config = load_config()
+    module_globals = globals()
+    module_globals['CONFIG'] = config
+    for attr, section in CONFIG_SECTIONS.items():
+        module_globals[attr] = config[section]
+    return module_globals[name]
 
 # Table configurations - these define the schema and should not be user-configurable
 TABLE_CONFIGS = [
@@ -551,6 +568,10 @@ TABLE_CONFIGS = [
     }
 ]
 
+# Table configurations keyed for direct lookup (same dicts as TABLE_CONFIGS)
+TABLE_CONFIGS_BY_NAME = {table_config['name']: table_config for table_config in TABLE_CONFIGS}
+TABLE_CONFIGS_BY_XML_TAG = {table_config['xml_tag']: table_config for table_config in TABLE_CONFIGS}
+
 # Sync schedule defaults
 SYNC_SCHEDULE_DEFAULTS = [
     # High-frequency transaction tables
@@ -599,4 +620,10 @@ SYNC_SCHEDULE_DEFAULTS = [
 
     # Global settings row
     ('_GLOBAL_', 60, 360, 720, 0)
-]
\ No newline at end of file
+]
+
+# Sync schedule defaults keyed by table name - intervals are in minutes, matching
+# the sync_schedule columns (None = not synced in that window)
+ScheduleRow = namedtuple('ScheduleRow', ['business_hours_interval', 'after_hours_interval',
+                                         'weekend_interval', 'priority'])
+SYNC_SCHEDULE = {table_name: ScheduleRow(*intervals) for table_name, *intervals in SYNC_SCHEDULE_DEFAULTS}
\ No newline at end of file
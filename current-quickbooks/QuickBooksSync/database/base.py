@@ -3,8 +3,46 @@ Base database interface for QuickBooks sync
 Provides abstract interface that can be implemented by SQLite, SQL Express, etc.
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Set, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterator, Mapping, Iterable, Sequence
 import datetime
+import re
+
+# Strings int()/float() accept: optional whitespace (int/float don't strip the
+# \x1c-\x1f separators that \s matches), sign, digits with single underscores,
+# and for floats a fraction and/or exponent. Matching these avoids raising and
+# catching ValueError for every non-numeric string.
+_SPACE = r'[^\S\x1c-\x1f]*'
+_DIGITS = r'\d+(?:_\d+)*'
+_INT_STR_RE = re.compile(_SPACE + r'[+-]?' + _DIGITS + _SPACE)
+_FLOAT_STR_RE = re.compile(_SPACE + r'[+-]?(?:' + _DIGITS + r'(?:\.(?:' + _DIGITS + r')?)?|\.' + _DIGITS + r')'
+                           r'(?:[eE][+-]?' + _DIGITS + r')?' + _SPACE)
+
+
+def is_int_str(s: str) -> bool:
+    """Check if string represents an integer"""
+    return _INT_STR_RE.fullmatch(s) is not None
+
+
+def is_float_str(s: str) -> bool:
+    """Check if string represents a float (with a decimal point or exponent)"""
+    return _FLOAT_STR_RE.fullmatch(s) is not None and ('.' in s or 'e' in s or 'E' in s)
+
+
+# Type names as plain module globals so determine_type's per-value path does a
+# single global lookup instead of a global plus a class attribute lookup
+_TEXT = "TEXT"
+_INTEGER = "INTEGER"
+_REAL = "REAL"
+_BOOL_STRINGS = frozenset(('true', 'false'))
+
+# Type lattice as bits: a field's observed types OR together into a mask and
+# _RESOLVE[mask] gives the winning type (TEXT > REAL > INTEGER, empty -> TEXT)
+_TEXT_BIT = 1
+_REAL_BIT = 2
+_INTEGER_BIT = 4
+_BIT_TYPES = {_TEXT_BIT: _TEXT, _REAL_BIT: _REAL, _INTEGER_BIT: _INTEGER}
+_RESOLVE = tuple(_TEXT if mask & _TEXT_BIT else _REAL if mask & _REAL_BIT else _INTEGER if mask & _INTEGER_BIT
+                 else _TEXT for mask in range(8))
 
 
 class DatabaseInterface(ABC):
@@ -20,6 +58,23 @@ class DatabaseInterface(ABC):
         """Close database connection"""
         pass
 
+    @abstractmethod
+    def configure_performance(self, profile: str) -> None:
+        """
+        Apply a durability/speed profile to the open connection
+        Profiles: 'balanced' (connection default), 'sync_safe', 'bulk_import'
+        """
+        pass
+
+    def __enter__(self) -> 'DatabaseInterface':
+        """Connect for the duration of a with block, reusing one connection throughout"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the connection when the with block ends"""
+        self.disconnect()
+
     @abstractmethod
     def create_table(self, table_name: str, fields_dict: Dict[str, str], primary_key: str) -> None:
         """Create table with specified schema"""
@@ -40,11 +95,33 @@ class DatabaseInterface(ABC):
                        fields_dict: Dict[str, str], primary_key: str,
                        modified_field: str) -> Tuple[int, int, int]:
         """
-        Insert or update records
+        Insert or update records one at a time
         Returns: (insert_count, update_count, skip_count)
         """
         pass
 
+    @abstractmethod
+    def bulk_upsert(self, table_name: str, records: List[Dict[str, Any]],
+                    fields_dict: Dict[str, str], primary_key: str,
+                    modified_field: str, force_update: bool = False) -> Tuple[int, int]:
+        """
+        Insert or update records with a single prepared UPSERT statement inside one
+        transaction - unless force_update is set, existing rows are only overwritten
+        when the incoming modified_field is newer (or either side has none), as in
+        insert_records
+        Returns: (upserted_count, unchanged_count)
+        """
+        pass
+
+    @abstractmethod
+    def bulk_load(self, table_name: str, rows: Iterable[Sequence[Any]], columns: Sequence[str]) -> int:
+        """
+        Load already-converted rows (values in columns order) through the backend's
+        fastest bulk path, replacing rows with the same primary key
+        Returns: number of rows written
+        """
+        pass
+
     @abstractmethod
     def insert_single_record(self, table_name: str, record: Dict[str, Any],
                              fields_dict: Dict[str, str], primary_key: str) -> None:
@@ -144,10 +221,24 @@ class DatabaseInterface(ABC):
         pass
 
     @abstractmethod
-    def get_fix_attempt_status(self, txn_id: str, table_name: str) -> Optional[Dict[str, Any]]:
+    def iter_orphaned_records(self, table_name: str, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream records with missing line items, fetching chunk_size rows at a time
+        Yields the same dicts as detect_orphaned_records; don't write to the table
+        or its line items while the iterator is open
+        """
+        pass
+
+    @abstractmethod
+    def count_orphaned_records(self, table_name: str) -> int:
+        """Count records with missing line items without fetching them"""
+        pass
+
+    @abstractmethod
+    def get_fix_attempt_status(self, txn_id: str, table_name: str) -> Optional[Mapping[str, Any]]:
         """
         Get the fix attempt status for a specific record
-        Returns dict with: AttemptCount, Status, LastAttemptDate, etc.
+        Returns a row addressable by column name with: AttemptCount, Status, LastAttemptDate, etc.
         """
         pass
 
@@ -158,8 +249,8 @@ class DatabaseInterface(ABC):
         pass
 
     @abstractmethod
-    def get_failed_fix_attempts(self) -> List[Dict[str, Any]]:
-        """Get all records that failed after 3 attempts"""
+    def get_failed_fix_attempts(self) -> List[Mapping[str, Any]]:
+        """Get all records that failed after 3 attempts (rows addressable by column name)"""
         pass
 
 
@@ -176,61 +267,87 @@ class SyncStatus:
 
 class FieldTypes:
     """SQL field type constants"""
-    TEXT = "TEXT"
-    INTEGER = "INTEGER"
-    REAL = "REAL"
+    TEXT = _TEXT
+    INTEGER = _INTEGER
+    REAL = _REAL
     BLOB = "BLOB"
 
     @staticmethod
     def determine_type(value: Any, current_types: Set[str]) -> str:
         """Determine SQL type for a value"""
+        # TEXT wins the resolution below, so once a field has it nothing can change
+        if _TEXT in current_types:
+            return _TEXT
+
+        bit = FieldTypes._type_bit(value)
+        current_types.add(_BIT_TYPES[bit])
+
+        # Resolve to single type; TEXT was ruled out above unless just added
+        if bit == _TEXT_BIT:
+            return _TEXT
+        return _REAL if _REAL in current_types else _INTEGER
+
+    @staticmethod
+    def _type_bit(value: Any) -> int:
+        """Classify a single value as one of the _TEXT_BIT/_REAL_BIT/_INTEGER_BIT lattice bits"""
         if value is None or value == '':
-            current_types.add(FieldTypes.TEXT)
+            return _TEXT_BIT
         elif isinstance(value, bool):
-            current_types.add(FieldTypes.INTEGER)
+            return _INTEGER_BIT
         elif isinstance(value, int):
-            current_types.add(FieldTypes.INTEGER)
+            return _INTEGER_BIT
         elif isinstance(value, float):
-            current_types.add(FieldTypes.REAL)
+            return _REAL_BIT
         elif isinstance(value, str):
-            if value.lower() in ['true', 'false']:
-                current_types.add(FieldTypes.INTEGER)
-            elif FieldTypes._is_int_str(value):
-                current_types.add(FieldTypes.INTEGER)
-            elif FieldTypes._is_float_str(value):
-                current_types.add(FieldTypes.REAL)
-            else:
-                current_types.add(FieldTypes.TEXT)
-        else:
-            current_types.add(FieldTypes.TEXT)
-
-        # Resolve to single type
-        if FieldTypes.TEXT in current_types:
-            return FieldTypes.TEXT
-        elif FieldTypes.REAL in current_types:
-            return FieldTypes.REAL
-        elif FieldTypes.INTEGER in current_types:
-            return FieldTypes.INTEGER
-        else:
-            return FieldTypes.TEXT
+            # Same checks as is_int_str/is_float_str, inlined for the per-value path
+            if value.lower() in _BOOL_STRINGS:
+                return _INTEGER_BIT
+            elif _INT_STR_RE.fullmatch(value) is not None:
+                return _INTEGER_BIT
+            elif _FLOAT_STR_RE.fullmatch(value) is not None and ('.' in value or 'e' in value or 'E' in value):
+                return _REAL_BIT
+            return _TEXT_BIT
+        return _TEXT_BIT
 
     @staticmethod
-    def _is_int_str(s: str) -> bool:
-        """Check if string represents an integer"""
-        try:
-            int(s)
-            return True
-        except ValueError:
-            return False
+    def determine_types_batch(records: List[Dict[str, Any]], field_masks: Dict[str, int]) -> None:
+        """
+        Fold the types seen in a batch of records into field_masks (field -> lattice
+        bitmask), which callers carry across batches and pass to resolve_types
+        Each column is scanned once and stops as soon as it reaches TEXT, which always
+        wins resolution; a repeated string value is only classified the first time it appears
+        """
+        missing = object()
+        type_bit = FieldTypes._type_bit
+        for field in dict.fromkeys(field for record in records for field in record):
+            mask = field_masks.get(field, 0)
+            if mask & _TEXT_BIT:
+                continue
+
+            seen_strings = set()
+            for record in records:
+                value = record.get(field, missing)
+                if value is missing:
+                    continue
+                if isinstance(value, str):
+                    if value in seen_strings:
+                        continue
+                    seen_strings.add(value)
+                mask |= type_bit(value)
+                if mask & _TEXT_BIT:
+                    break
+            field_masks[field] = mask
 
     @staticmethod
-    def _is_float_str(s: str) -> bool:
-        """Check if string represents a float"""
-        try:
-            float(s)
-            return '.' in s or 'e' in s.lower()
-        except ValueError:
-            return False
+    def resolve_types(field_names: Iterable[str], field_masks: Dict[str, int]) -> Dict[str, str]:
+        """
+        Resolve each field's lattice mask to a single SQL type
+        Priority: TEXT > REAL > INTEGER; a field with no observed type is TEXT
+        """
+        return {field: _RESOLVE[field_masks.get(field, 0)] for field in field_names}
+
+    _is_int_str = staticmethod(is_int_str)
+    _is_float_str = staticmethod(is_float_str)
 
 
 class MetadataBugStatus:
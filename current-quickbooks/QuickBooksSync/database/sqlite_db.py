@@ -5,7 +5,7 @@ Modified to store the maximum TimeModified value as last_sync_time
 import sqlite3
 import logging
 import os
-from typing import List, Dict, Any, Optional, Set, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterator, Mapping, Iterable, Sequence
 import datetime
 from contextlib import contextmanager
 
@@ -15,10 +15,38 @@ from .base import DatabaseInterface, SyncStatus, FieldTypes, MetadataBugStatus
 class SQLiteDatabase(DatabaseInterface):
     """SQLite implementation of database interface"""
 
+    # PRAGMA settings per configure_performance() profile. WAL and in-memory temp
+    # storage are always on (see connect); 'balanced' matches the connect defaults.
+    PERFORMANCE_PROFILES = {
+        'balanced': {
+            'synchronous': 'NORMAL',
+            'cache_size': 10000,
+            'mmap_size': 0,
+            'wal_autocheckpoint': 1000
+        },
+        'sync_safe': {
+            'synchronous': 'FULL',
+            'cache_size': 10000,
+            'mmap_size': 0,
+            'wal_autocheckpoint': 1000
+        },
+        'bulk_import': {
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,  # 64 MB
+            'mmap_size': 268435456,  # 256 MB
+            'wal_autocheckpoint': 10000
+        }
+    }
+
+    # Tables whose headers can lose their line items (QuickBooks metadata bug)
+    ORPHAN_CHECK_TABLES = ('invoices', 'sales_orders', 'purchase_orders', 'estimates', 'credit_memos')
+
     def __init__(self, config: Dict[str, Any]):
         self.db_path = config['path']
         self.connection = None
         self.in_transaction = False
+        # table_name -> (header_fields, line_fields) already read from custom_fields_registry
+        self._custom_fields_cache = {}
 
         # Ensure directory exists
         db_dir = os.path.dirname(self.db_path)
@@ -32,7 +60,8 @@ class SQLiteDatabase(DatabaseInterface):
             self.connection = sqlite3.connect(
                 self.db_path,
                 timeout=30.0,  # 30 second timeout
-                check_same_thread=False  # Allow multi-threaded access
+                check_same_thread=False,  # Allow multi-threaded access
+                cached_statements=512  # Keep every table's per-table statements prepared
             )
             self.connection.row_factory = sqlite3.Row
 
@@ -45,6 +74,22 @@ class SQLiteDatabase(DatabaseInterface):
 
             logging.debug(f"Connected to SQLite database: {self.db_path}")
 
+    def configure_performance(self, profile: str) -> None:
+        """Apply one of PERFORMANCE_PROFILES to the connection"""
+        if profile not in self.PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown performance profile: {profile}")
+
+        self.connect()
+        # PRAGMA synchronous can't change inside a transaction - skip rather than
+        # raise, so a cleanup call doesn't mask the error that left one open
+        if self.connection.in_transaction:
+            logging.warning(f"Transaction still open, not applying '{profile}' performance profile")
+            return
+
+        for pragma, value in self.PERFORMANCE_PROFILES[profile].items():
+            self.connection.execute(f"PRAGMA {pragma}={value}")
+        logging.debug(f"Applied '{profile}' performance profile")
+
     def disconnect(self) -> None:
         """Close database connection"""
         if self.connection:
@@ -64,6 +109,21 @@ class SQLiteDatabase(DatabaseInterface):
         finally:
             cursor.close()
 
+    @staticmethod
+    def _row_values(record: Dict[str, Any], columns: List[str], fields_dict: Dict[str, str]) -> List[Any]:
+        """Record values in columns order - bools and 'true'/'false' in INTEGER columns become 1/0"""
+        values = []
+        for col in columns:
+            val = record.get(col)
+            if isinstance(val, bool):
+                values.append(1 if val else 0)
+            elif isinstance(val, str) and fields_dict.get(col) == FieldTypes.INTEGER and val.lower() in ['true',
+                                                                                                         'false']:
+                values.append(1 if val.lower() == 'true' else 0)
+            else:
+                values.append(val)
+        return values
+
     def create_table(self, table_name: str, fields_dict: Dict[str, str], primary_key: str) -> None:
         """Create table with specified schema"""
         with self._get_cursor() as cursor:
@@ -204,16 +264,7 @@ class SQLiteDatabase(DatabaseInterface):
 
                 # Prepare values
                 columns = list(fields_dict.keys())
-                values = []
-                for col in columns:
-                    val = record.get(col)
-                    if isinstance(val, bool):
-                        values.append(1 if val else 0)
-                    elif isinstance(val, str) and fields_dict.get(col) == FieldTypes.INTEGER and val.lower() in ['true',
-                                                                                                                 'false']:
-                        values.append(1 if val.lower() == 'true' else 0)
-                    else:
-                        values.append(val)
+                values = self._row_values(record, columns, fields_dict)
 
                 if existing:
                     # Update existing record
@@ -267,13 +318,31 @@ class SQLiteDatabase(DatabaseInterface):
 
         return insert_count, update_count, skip_count
 
-    def insert_records_batch(self, table_name: str, records: List[Dict[str, Any]],
-                             fields_dict: Dict[str, str], primary_key: str) -> int:
-        """Insert multiple records in a single transaction"""
+    def bulk_upsert(self, table_name: str, records: List[Dict[str, Any]],
+                    fields_dict: Dict[str, str], primary_key: str,
+                    modified_field: str, force_update: bool = False) -> Tuple[int, int]:
+        """
+        Insert or update records with one UPSERT statement in a single transaction
+
+        Existing rows are only overwritten when the incoming modified_field is newer,
+        or when either side has no value - the same rule insert_records applies,
+        but decided inside SQLite instead of with a SELECT per record.
+
+        Args:
+            table_name: Name of the table
+            records: List of record dictionaries
+            fields_dict: Field name to type mapping
+            primary_key: Primary key field name
+            modified_field: Field containing modification timestamp
+            force_update: If True, update all records regardless of TimeModified
+
+        Returns:
+            Tuple of (upserted_count, unchanged_count) - unchanged includes records
+            skipped for a missing primary key
+        """
         if not records:
-            return 0
+            return 0, 0
 
-        inserted = 0
         with self._get_cursor() as cursor:
             # Ensure all fields exist
             all_fields = set()
@@ -282,40 +351,115 @@ class SQLiteDatabase(DatabaseInterface):
 
             for field in all_fields:
                 if field not in fields_dict:
+                    logging.warning(f"Field '{field}' not in schema, adding as TEXT")
                     fields_dict[field] = FieldTypes.TEXT
                     self.add_column(table_name, field, FieldTypes.TEXT)
 
-            # Prepare SQL
+            # Prepare SQL once for the whole batch
             columns = list(fields_dict.keys())
             columns_sql = ', '.join([f'"{col}"' for col in columns])
             placeholders = ', '.join(['?' for _ in columns])
-            sql = f'INSERT OR REPLACE INTO "{table_name}" ({columns_sql}) VALUES ({placeholders})'
+            set_clause = ', '.join([f'"{col}" = excluded."{col}"' for col in columns if col != primary_key])
+            sql = f'INSERT INTO "{table_name}" ({columns_sql}) VALUES ({placeholders}) ON CONFLICT("{primary_key}") '
+            if not set_clause:
+                sql += 'DO NOTHING'
+            elif not force_update and modified_field in fields_dict:
+                incoming = f'excluded."{modified_field}"'
+                stored = f'"{table_name}"."{modified_field}"'
+                sql += (f"DO UPDATE SET {set_clause} WHERE COALESCE({incoming}, '') = '' "
+                        f"OR COALESCE({stored}, '') = '' OR {incoming} > {stored}")
+            else:
+                sql += f'DO UPDATE SET {set_clause}'
+
+            skipped = 0
+            rows = []
+            for record in records:
+                if record.get(primary_key) is None:
+                    skipped += 1
+                    continue
+
+                rows.append(self._row_values(record, columns, fields_dict))
 
-            # Insert all records in one transaction
+            if skipped:
+                logging.warning(f"{skipped} records missing primary key '{primary_key}', skipping")
+
+            # Join a transaction the caller already has open, otherwise wrap our own
+            owns_transaction = not self.connection.in_transaction
             try:
-                cursor.execute("BEGIN IMMEDIATE")
-
-                for record in records:
-                    values = []
-                    for col in columns:
-                        val = record.get(col)
-                        if isinstance(val, bool):
-                            values.append(1 if val else 0)
-                        elif isinstance(val, str) and fields_dict.get(col) == FieldTypes.INTEGER and val.lower() in [
-                            'true', 'false']:
-                            values.append(1 if val.lower() == 'true' else 0)
-                        else:
-                            values.append(val)
+                if owns_transaction:
+                    cursor.execute("BEGIN IMMEDIATE")
+                cursor.executemany(sql, rows)
+                written = cursor.rowcount
+                if owns_transaction:
+                    cursor.execute("COMMIT")
+            except BaseException:
+                # BaseException so a Ctrl-C mid-batch doesn't leave the transaction open
+                if owns_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+
+            unchanged = len(records) - written
+            logging.info(f"Table '{table_name}': {written} upserted, {unchanged} unchanged or skipped")
+
+        return written, unchanged
+
+    def bulk_load(self, table_name: str, rows: Iterable[Sequence[Any]], columns: Sequence[str]) -> int:
+        """
+        Load rows with one prepared INSERT OR REPLACE run through executemany
+
+        Rows are streamed straight to SQLite, so rows may be a generator. Joins a
+        transaction the caller already has open, otherwise wraps its own.
+
+        Args:
+            table_name: Name of the table
+            rows: Row value sequences, in the same order as columns
+            columns: Column names (must already exist in the table)
 
-                    cursor.execute(sql, values)
-                    inserted += 1
+        Returns:
+            Number of rows written
+        """
+        columns_sql = ', '.join([f'"{col}"' for col in columns])
+        placeholders = ', '.join(['?' for _ in columns])
+        sql = f'INSERT OR REPLACE INTO "{table_name}" ({columns_sql}) VALUES ({placeholders})'
 
-                cursor.execute("COMMIT")
-            except Exception as e:
-                cursor.execute("ROLLBACK")
+        with self._get_cursor() as cursor:
+            owns_transaction = not self.connection.in_transaction
+            try:
+                if owns_transaction:
+                    cursor.execute("BEGIN IMMEDIATE")
+                cursor.executemany(sql, rows)
+                written = max(cursor.rowcount, 0)
+                if owns_transaction:
+                    cursor.execute("COMMIT")
+            except BaseException:
+                # BaseException so a Ctrl-C mid-batch doesn't leave the transaction open
+                if owns_transaction:
+                    cursor.execute("ROLLBACK")
                 raise
 
-        return inserted
+        return written
+
+    def insert_records_batch(self, table_name: str, records: List[Dict[str, Any]],
+                             fields_dict: Dict[str, str], primary_key: str) -> int:
+        """Insert multiple records in a single transaction"""
+        if not records:
+            return 0
+
+        # Ensure all fields exist
+        all_fields = set()
+        for record in records:
+            all_fields.update(record.keys())
+
+        for field in all_fields:
+            if field not in fields_dict:
+                fields_dict[field] = FieldTypes.TEXT
+                self.add_column(table_name, field, FieldTypes.TEXT)
+
+        columns = list(fields_dict.keys())
+        rows = (self._row_values(record, columns, fields_dict) for record in records)
+
+        # Insert all records in one transaction
+        return self.bulk_load(table_name, rows, columns)
 
     def insert_single_record(self, table_name: str, record: Dict[str, Any],
                              fields_dict: Dict[str, str], primary_key: str) -> None:
@@ -328,16 +472,7 @@ class SQLiteDatabase(DatabaseInterface):
                     self.add_column(table_name, field, FieldTypes.TEXT)
 
             columns = list(fields_dict.keys())
-            values = []
-            for col in columns:
-                val = record.get(col)
-                if isinstance(val, bool):
-                    values.append(1 if val else 0)
-                elif isinstance(val, str) and fields_dict.get(col) == FieldTypes.INTEGER and val.lower() in ['true',
-                                                                                                             'false']:
-                    values.append(1 if val.lower() == 'true' else 0)
-                else:
-                    values.append(val)
+            values = self._row_values(record, columns, fields_dict)
 
             columns_sql = ', '.join([f'"{col}"' for col in columns])
             placeholders = ', '.join(['?' for _ in columns])
@@ -577,27 +712,37 @@ class SQLiteDatabase(DatabaseInterface):
             current_time = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
 
             # Track header fields
-            for field_name in header_fields:
-                cursor.execute('''
-                INSERT INTO custom_fields_registry (table_name, field_name, field_level, last_seen)
-                VALUES (?, ?, 'HEADER', ?)
-                ON CONFLICT(table_name, field_name) DO UPDATE SET last_seen = excluded.last_seen
-                ''', (table_name, field_name, current_time))
+            cursor.executemany('''
+            INSERT INTO custom_fields_registry (table_name, field_name, field_level, last_seen)
+            VALUES (?, ?, 'HEADER', ?)
+            ON CONFLICT(table_name, field_name) DO UPDATE SET last_seen = excluded.last_seen
+            ''', [(table_name, field_name, current_time) for field_name in header_fields])
 
             # Track line fields
             if line_fields:
                 line_table = f"{table_name}_line_items"
-                for field_name in line_fields:
-                    cursor.execute('''
-                    INSERT INTO custom_fields_registry (table_name, field_name, field_level, last_seen)
-                    VALUES (?, ?, 'LINE', ?)
-                    ON CONFLICT(table_name, field_name) DO UPDATE SET last_seen = excluded.last_seen
-                    ''', (line_table, field_name, current_time))
+                cursor.executemany('''
+                INSERT INTO custom_fields_registry (table_name, field_name, field_level, last_seen)
+                VALUES (?, ?, 'LINE', ?)
+                ON CONFLICT(table_name, field_name) DO UPDATE SET last_seen = excluded.last_seen
+                ''', [(line_table, field_name, current_time) for field_name in line_fields])
 
             self.connection.commit()
 
+        # Keep an already-loaded registry entry in step with what was just written
+        cached = self._custom_fields_cache.get(table_name)
+        if cached:
+            cached[0].update(header_fields)
+            if line_fields:
+                cached[1].update(line_fields)
+
     def get_known_custom_fields(self, table_name: str) -> Tuple[Set[str], Set[str]]:
-        """Get known custom fields for table"""
+        """Get known custom fields for table (read from the registry once, then cached)"""
+        cached = self._custom_fields_cache.get(table_name)
+        if cached:
+            # Callers extend the returned sets, so hand out copies
+            return set(cached[0]), set(cached[1])
+
         header_fields = set()
         line_fields = set()
 
@@ -622,6 +767,7 @@ class SQLiteDatabase(DatabaseInterface):
             for row in cursor.fetchall():
                 line_fields.add(row[0])
 
+        self._custom_fields_cache[table_name] = (set(header_fields), set(line_fields))
         return header_fields, line_fields
 
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Tuple]:
@@ -799,10 +945,22 @@ class SQLiteDatabase(DatabaseInterface):
         Returns:
             List of orphaned records with their details
         """
+        return list(self.iter_orphaned_records(table_name))
+
+    def iter_orphaned_records(self, table_name: str, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream header records that have no line items, chunk_size rows at a time
+
+        Args:
+            table_name: Name of the table to check (must have line items)
+            chunk_size: Rows fetched from the cursor per round
+
+        Yields:
+            Orphaned records with their details, as detect_orphaned_records returns them
+        """
         # Only applies to tables with line items
-        if table_name not in ['invoices', 'sales_orders', 'purchase_orders',
-                              'estimates', 'credit_memos']:
-            return []
+        if table_name not in self.ORPHAN_CHECK_TABLES:
+            return
 
         with self._get_cursor() as cursor:
             # First, check what columns exist in this table
@@ -860,27 +1018,41 @@ class SQLiteDatabase(DatabaseInterface):
             """
 
             cursor.execute(query)
-            results = cursor.fetchall()
-
-            orphaned_records = []
-            for row in results:
-                record = {
-                    'TxnID': row[0],
-                    'RefNumber': row[1],
-                    'EditSequence': row[2],
-                    'Amount': row[3] or 0.0,  # Handle NULL amounts as 0
-                    'TxnDate': row[4],
-                    'CustomerRef_FullName': row[5],
-                    'VendorRef_FullName': row[6]
-                }
-                orphaned_records.append(record)
-
-            return orphaned_records
-
-    def get_fix_attempt_status(self, txn_id: str, table_name: str) -> Optional[Dict[str, Any]]:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                for row in rows:
+                    yield {
+                        'TxnID': row[0],
+                        'RefNumber': row[1],
+                        'EditSequence': row[2],
+                        'Amount': row[3] or 0.0,  # Handle NULL amounts as 0
+                        'TxnDate': row[4],
+                        'CustomerRef_FullName': row[5],
+                        'VendorRef_FullName': row[6]
+                    }
+
+    def count_orphaned_records(self, table_name: str) -> int:
+        """Count header records that have no line items, without fetching them"""
+        # Only applies to tables with line items
+        if table_name not in self.ORPHAN_CHECK_TABLES:
+            return 0
+
+        with self._get_cursor() as cursor:
+            cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM {table_name} h
+            LEFT JOIN {table_name}_line_items l ON h.TxnID = l.TxnID
+            WHERE l.TxnID IS NULL
+            """)
+            return cursor.fetchone()[0]
+
+    def get_fix_attempt_status(self, txn_id: str, table_name: str) -> Optional[Mapping[str, Any]]:
         """
         Get the fix attempt status for a specific record
-        Returns dict with: AttemptCount, Status, LastAttemptDate, etc.
+        Returns a sqlite3.Row with: AttemptCount, Status, LastAttemptDate, LastError
         """
         with self._get_cursor() as cursor:
             cursor.execute("""
@@ -889,15 +1061,8 @@ class SQLiteDatabase(DatabaseInterface):
                 WHERE TxnID = ? AND TableName = ?
             """, (txn_id, table_name))
 
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'AttemptCount': row[0],
-                    'Status': row[1],
-                    'LastAttemptDate': row[2],
-                    'LastError': row[3]
-                }
-        return None
+            # Rows come back as sqlite3.Row, already addressable by column name
+            return cursor.fetchone()
 
     def record_fix_attempt(self, txn_id: str, table_name: str,
                           success: bool, error_message: Optional[str] = None,
@@ -947,10 +1112,8 @@ class SQLiteDatabase(DatabaseInterface):
 
             self.connection.commit()
 
-    def get_failed_fix_attempts(self) -> List[Dict[str, Any]]:
-        """Get all records that failed after 3 attempts"""
-        failed_records = []
-
+    def get_failed_fix_attempts(self) -> List[Mapping[str, Any]]:
+        """Get all records that failed after 3 attempts (as sqlite3.Row objects)"""
         with self._get_cursor() as cursor:
             cursor.execute("""
                 SELECT TxnID, TableName, RefNumber, EditSequence, 
@@ -960,16 +1123,4 @@ class SQLiteDatabase(DatabaseInterface):
                 ORDER BY TableName, RefNumber
             """, (MetadataBugStatus.FAILED,))
 
-            for row in cursor.fetchall():
-                failed_records.append({
-                    'TxnID': row[0],
-                    'TableName': row[1],
-                    'RefNumber': row[2],
-                    'EditSequence': row[3],
-                    'FirstAttemptDate': row[4],
-                    'LastAttemptDate': row[5],
-                    'AttemptCount': row[6],
-                    'LastError': row[7]
-                })
-
-        return failed_records
\ No newline at end of file
+            return cursor.fetchall()
\ No newline at end of file
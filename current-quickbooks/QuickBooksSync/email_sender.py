@@ -15,6 +15,13 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def tls_context():
+    """Shared client TLS context - the system CA store is loaded once, not per connection"""
+    return ssl.create_default_context()
 
 
 class EmailSender:
@@ -58,9 +65,8 @@ class EmailSender:
         try:
             # Create SMTP connection
             if self.config.get('use_tls'):
-                context = ssl.create_default_context()
                 server = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'])
-                server.starttls(context=context)
+                server.starttls(context=tls_context())
             else:
                 server = smtplib.SMTP_SSL(self.config['smtp_server'], self.config['smtp_port'])
 
@@ -98,6 +104,9 @@ class EmailSender:
             return False, "No valid recipients"
 
         try:
+            # One timestamp for the subject and body
+            report_date = datetime.now().strftime('%B %d, %Y')
+
             # Create message
             msg = MIMEMultipart()
 
@@ -108,7 +117,7 @@ class EmailSender:
 
             # Subject
             if not subject:
-                subject = f"{report_name} - {datetime.now().strftime('%B %d, %Y')}"
+                subject = f"{report_name} - {report_date}"
             msg['Subject'] = subject
 
             # Reply-to if configured
@@ -120,7 +129,7 @@ class EmailSender:
                 body = f"""
 Good morning,
 
-Please find attached the {report_name} for {datetime.now().strftime('%B %d, %Y')}.
+Please find attached the {report_name} for {report_date}.
 
 This report includes:
 - Month-to-date sales performance
@@ -137,17 +146,15 @@ QuickBooks Sync System
             msg.attach(MIMEText(body, 'plain'))
 
             # Attach PDF
-            with open(pdf_path, 'rb') as f:
-                attach = MIMEApplication(f.read(), _subtype="pdf")
-                attach.add_header('Content-Disposition', 'attachment',
-                                  filename=os.path.basename(pdf_path))
-                msg.attach(attach)
+            attach = MIMEApplication(Path(pdf_path).read_bytes(), _subtype="pdf")
+            attach.add_header('Content-Disposition', 'attachment',
+                              filename=os.path.basename(pdf_path))
+            msg.attach(attach)
 
             # Send email
             if self.config.get('use_tls'):
-                context = ssl.create_default_context()
                 server = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'])
-                server.starttls(context=context)
+                server.starttls(context=tls_context())
             else:
                 server = smtplib.SMTP_SSL(self.config['smtp_server'], self.config['smtp_port'])
 
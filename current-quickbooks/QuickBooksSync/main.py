@@ -217,10 +217,11 @@ def sync_tables(qb: QuickBooksConnection, db: DatabaseInterface,
             tables_with_orphaned = []
 
             for table_name in synced_tables_with_line_items:
-                orphaned_records = db.detect_orphaned_records(table_name)
-                if orphaned_records:
-                    logging.info(f"{table_name}: Found {len(orphaned_records)} orphaned records")
-                    total_orphaned += len(orphaned_records)
+                # Only the count is needed here
+                orphaned_count = db.count_orphaned_records(table_name)
+                if orphaned_count:
+                    logging.info(f"{table_name}: Found {orphaned_count} orphaned records")
+                    total_orphaned += orphaned_count
                     tables_with_orphaned.append(table_name)
                 else:
                     logging.info(f"{table_name}: No orphaned records found")
@@ -531,17 +532,23 @@ def main():
                 elif args.tables:
                     tables_to_sync = args.tables
 
-                # Perform sync with iterators
-                sync_tables(
-                    qb, db,
-                    tables_to_sync,
-                    args.full,
-                    args.skip_auto_analysis,
-                    batch_size=args.batch_size,
-                    show_progress=not args.no_progress,
-                    check_orphaned=not args.skip_orphaned_check,
-                    auto_fix_orphaned=True  # Always fix orphaned records
-                )
+                # Larger page cache, memory-mapped reads and fewer WAL checkpoints
+                # for the duration of the sync
+                db.configure_performance('bulk_import')
+                try:
+                    # Perform sync with iterators
+                    sync_tables(
+                        qb, db,
+                        tables_to_sync,
+                        args.full,
+                        args.skip_auto_analysis,
+                        batch_size=args.batch_size,
+                        show_progress=not args.no_progress,
+                        check_orphaned=not args.skip_orphaned_check,
+                        auto_fix_orphaned=True  # Always fix orphaned records
+                    )
+                finally:
+                    db.configure_performance('balanced')
 
             # Verify database after sync
             logging.info("\n==== POST-SYNC DATABASE VERIFICATION ====")
@@ -14,7 +14,7 @@ from database.base import DatabaseInterface, SyncStatus, FieldTypes, MetadataBug
 from quickbooks.connection import QuickBooksConnection
 from quickbooks.query_builder import QueryBuilder
 from extraction.data_extractor import DataExtractor
-from utils import get_com_value, determine_field_types, resolve_field_types, log_com_error
+from utils import get_com_value, log_com_error
 
 
 class RecordSyncHandler:
@@ -248,9 +248,9 @@ class RecordSyncHandler:
         # Get known custom fields
         header_fields, line_fields = self.db.get_known_custom_fields(table_name)
 
-        # Track field types
-        header_field_types = defaultdict(set)
-        line_field_types = defaultdict(set)
+        # Track field types (field -> type lattice mask, see FieldTypes.determine_types_batch)
+        header_field_types = {}
+        line_field_types = {}
 
         # Check iterator type
         iterator_type = table_config.get('iterator_type', 'standard')
@@ -498,8 +498,8 @@ class RecordSyncHandler:
 
     def _extract_batch_data(self, records: Any, table_config: Dict[str, Any],
                             batch_count: int, header_fields: Set[str], line_fields: Set[str],
-                            header_field_types: Dict[str, Set[str]],
-                            line_field_types: Dict[str, Set[str]]) -> Tuple[List, List, List, Optional[str]]:
+                            header_field_types: Dict[str, int],
+                            line_field_types: Dict[str, int]) -> Tuple[List, List, List, Optional[str]]:
         """Extract data from a batch of records"""
         table_name = table_config["name"]
         has_line_items = table_config.get("has_line_items", False)
@@ -556,9 +556,6 @@ class RecordSyncHandler:
 
             batch_header_data.append(header_data)
 
-            # Track field types
-            determine_field_types([header_data], header_field_types)
-
             # Extract line items
             if has_line_items:
                 parent_id = header_data.get(key_field)
@@ -567,7 +564,6 @@ class RecordSyncHandler:
                         record, table_config, parent_id, line_fields
                     )
                     batch_line_data.extend(line_items)
-                    determine_field_types(line_items, line_field_types)
 
             # Extract LinkedTxn data if applicable
             if extract_linked_txns:
@@ -582,13 +578,18 @@ class RecordSyncHandler:
                     except Exception as e:
                         logging.debug(f"Could not extract linked transactions: {e}")
 
+        # Track field types - one column-wise pass over the whole batch
+        FieldTypes.determine_types_batch(batch_header_data, header_field_types)
+        if batch_line_data:
+            FieldTypes.determine_types_batch(batch_line_data, line_field_types)
+
         return batch_header_data, batch_line_data, batch_linked_txns, batch_max_modified
 
     def _save_accumulated_data(self, table_name: str, header_data: List[Dict[str, Any]],
                                line_data: List[Dict[str, Any]], linked_txns: List[Dict[str, Any]],
                                header_fields: Set[str], line_fields: Set[str],
-                               header_field_types: Dict[str, Set[str]],
-                               line_field_types: Dict[str, Set[str]],
+                               header_field_types: Dict[str, int],
+                               line_field_types: Dict[str, int],
                                table_config: Dict[str, Any]) -> None:
         """Save accumulated data to database"""
         key_field = table_config["key_field"]
@@ -709,9 +710,9 @@ class RecordSyncHandler:
         table_name = table_config["name"]
         header_fields, line_fields = self.db.get_known_custom_fields(table_name)
 
-        # Track field types
-        header_field_types = defaultdict(set)
-        line_field_types = defaultdict(set)
+        # Track field types (field -> type lattice mask, see FieldTypes.determine_types_batch)
+        header_field_types = {}
+        line_field_types = {}
 
         # Extract all data
         all_header_data, all_line_data, all_linked_txns, max_time_modified = self._extract_batch_data(
@@ -730,8 +731,8 @@ class RecordSyncHandler:
 
     def _save_data(self, table_name: str, header_data: List[Dict[str, Any]],
                    line_data: List[Dict[str, Any]], header_fields: Set[str],
-                   line_fields: Set[str], header_types: Dict[str, Set[str]],
-                   line_types: Dict[str, Set[str]], key_field: str,
+                   line_fields: Set[str], header_types: Dict[str, int],
+                   line_types: Dict[str, int], key_field: str,
                    modified_field: str, has_line_items: bool, force_update: bool = False) -> None:
         """Save extracted data to database"""
         # Save header data
@@ -744,13 +745,12 @@ class RecordSyncHandler:
                 logging.warning(f"No header fields tracked for {table_name}, extracted {len(header_fields)} from data")
 
             # Ensure field types are determined
-            if not header_types or all(not types for types in header_types.values()):
+            if not any(header_types.values()):
                 # Re-determine field types from data
-                from utils import determine_field_types
-                determine_field_types(header_data, header_types)
+                FieldTypes.determine_types_batch(header_data, header_types)
                 logging.warning(f"Re-determined field types for {table_name}")
 
-            resolved_header_types = resolve_field_types(header_fields, header_types)
+            resolved_header_types = FieldTypes.resolve_types(header_fields, header_types)
 
             # Ensure at minimum we have the key fields
             if key_field not in resolved_header_types:
@@ -763,12 +763,12 @@ class RecordSyncHandler:
 
             self.db.create_table(table_name, resolved_header_types, key_field)
 
-            insert_count, update_count, skip_count = self.db.insert_records(
+            upsert_count, unchanged_count = self.db.bulk_upsert(
                 table_name, header_data, resolved_header_types,
                 key_field, modified_field, force_update=force_update
             )
 
-            logging.debug(f"Batch saved: {insert_count} inserted, {update_count} updated, {skip_count} skipped")
+            logging.debug(f"Batch saved: {upsert_count} upserted, {unchanged_count} unchanged or skipped")
 
         # Save line items - OPTIMIZED VERSION
         if has_line_items and line_data:
@@ -780,12 +780,11 @@ class RecordSyncHandler:
                     line_fields.update(record.keys())
                 logging.warning(f"No line fields tracked for {line_table}, extracted {len(line_fields)} from data")
 
-            if not line_types or all(not types for types in line_types.values()):
-                from utils import determine_field_types
-                determine_field_types(line_data, line_types)
+            if not any(line_types.values()):
+                FieldTypes.determine_types_batch(line_data, line_types)
                 logging.warning(f"Re-determined field types for {line_table}")
 
-            resolved_line_types = resolve_field_types(line_fields, line_types)
+            resolved_line_types = FieldTypes.resolve_types(line_fields, line_types)
 
             # Determine line item primary key
             line_pk = 'TxnLineID' if 'TxnLineID' in resolved_line_types else 'line_item_id'
@@ -1258,11 +1257,8 @@ class RecordSyncHandler:
         """Sync a single record from QuickBooks"""
         try:
             # Find table config
-            from config import TABLE_CONFIGS
-            table_config = next(
-                (cfg for cfg in TABLE_CONFIGS if cfg['name'] == table_name),
-                None
-            )
+            from config import TABLE_CONFIGS_BY_NAME
+            table_config = TABLE_CONFIGS_BY_NAME.get(table_name)
 
             if not table_config:
                 return False
@@ -6,13 +6,19 @@ import sys
 import datetime
 import pywintypes
 import sqlite3
-from collections import defaultdict
+from collections import defaultdict, deque
+import itertools
 import traceback
+import atexit
+import queue
+import threading
+import pythoncom
+from concurrent.futures import ThreadPoolExecutor
 
-# Configure logging
+# Configure logging (DEBUG only with --verbose - see main)
 logging.basicConfig(
     filename='customer_price_pages.log',
-    level=logging.DEBUG,
+    level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
@@ -27,12 +33,129 @@ logging.getLogger('').addHandler(console)
 DB_PATH = r'C:\Users\radke\quickbooks_data.db'
 
 # Configuration
-BATCH_SIZE = 100  # Number of items to add per sales order
+BATCH_SIZE = 500  # Starting number of items per estimate, halved if QuickBooks rejects it
+MIN_BATCH_SIZE = 50  # Smallest batch size tried before giving up on a batch
 PROGRESS_SAVE_INTERVAL = 50  # Save progress every N customers
+WORKER_COUNT = 4  # QuickBooks sessions pricing customers in parallel (QB saturates around 4-8)
 TEST_MODE = True  # Set to False for full extraction
 TEST_CUSTOMER_LIMIT = 1  # Number of customers to test
 TEST_ITEM_LIMIT = 500  # Number of items to test
 
+# Rows are buffered and written with executemany once this many are waiting
+PRICE_BUFFER_SIZE = 10000
+
+# A price row, as passed around instead of a dict per price
+PRICE_ROW_FIELDS = ('CustomerListID', 'CustomerName', 'ItemListID', 'ItemName', 'ItemFullName', 'Rate')
+
+# Largest batch size QuickBooks has accepted so far this run - worker sessions
+# only lower it, under _batch_size_lock
+_batch_size = BATCH_SIZE
+_batch_size_lock = threading.Lock()
+
+# Numbers the temporary estimates of this run - shared by all worker sessions
+# (next() on an itertools.count is atomic under the GIL)
+_estimate_counter = itertools.count()
+
+# Shared database connection, opened on first use and closed at exit
+_conn = None
+
+# Cursor reused by every save_customer_prices call
+_write_cursor = None
+
+# Set once the price tables and indexes have been created/migrated
+_db_initialized = False
+
+# Set while the name indexes are dropped for a full rebuild
+_name_indexes_dropped = False
+
+# Bulk-load settings used while extracting - no journal or fsync, so a crashed
+# run can leave the price table inconsistent; recover by rerunning with --fresh
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-200000",  # ~200 MB page cache
+)
+
+# Settings restored after extraction (same as the sync database uses)
+NORMAL_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+# Price writes - fixed SQL text so sqlite3 reuses the prepared statements
+INSERT_SQL = '''
+    INSERT INTO customer_price_pages 
+    (CustomerListID, CustomerName, ItemListID, ItemName, ItemFullName, Price, LastUpdated)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+UPSERT_SQL = INSERT_SQL + '''ON CONFLICT(CustomerListID, ItemListID) DO UPDATE SET
+        CustomerName = excluded.CustomerName,
+        ItemName = excluded.ItemName,
+        ItemFullName = excluded.ItemFullName,
+        Price = excluded.Price,
+        LastUpdated = excluded.LastUpdated
+    '''
+
+# Lookup indexes on the name columns - only used for reporting, so they are
+# dropped during a bulk load and rebuilt once afterwards
+NAME_INDEXES = {
+    'idx_customer_prices_customer_name': '''
+        CREATE INDEX IF NOT EXISTS idx_customer_prices_customer_name 
+        ON customer_price_pages (CustomerName)
+        ''',
+    'idx_customer_prices_item_name': '''
+        CREATE INDEX IF NOT EXISTS idx_customer_prices_item_name 
+        ON customer_price_pages (ItemName)
+        ''',
+}
+
+# Item types that can be put on an estimate, as (ItemQueryRs ret element, type name)
+SELLABLE_ITEM_TYPES = (
+    ('ItemInventoryRet', 'Inventory'),
+    ('ItemServiceRet', 'Service'),
+    ('ItemNonInventoryRet', 'NonInventory'),
+    ('ItemOtherChargeRet', 'OtherCharge'),
+)
+
+# Fields returned by the item query (the sales price fields are used for price levels)
+ITEM_RET_ELEMENTS = ('ListID', 'Name', 'FullName', 'IsActive',
+                     'SalesPrice', 'SalesOrPurchase', 'SalesAndPurchase')
+
+# Where each item type keeps its standard sales price
+ITEM_BASE_PRICE_PATHS = (
+    ('SalesPrice',),  # Inventory
+    ('ORSalesPurchase', 'SalesOrPurchase', 'ORPrice', 'Price'),  # Service, NonInventory, OtherCharge
+    ('ORSalesPurchase', 'SalesAndPurchase', 'SalesPrice'),
+)
+
+# StatusCodes QuickBooks returns when a record is in use or it is too busy to
+# process the request - these are retried with exponential backoff
+QB_BUSY_STATUS_CODES = (3175, 3180)
+# Errors a smaller batch won't fix: busy, or an invalid item reference (3140)
+QB_NOT_SIZE_STATUS_CODES = QB_BUSY_STATUS_CODES + (3140,)
+BUSY_MAX_RETRIES = 6
+
+# QBFC ENRqOnError value - keep processing the rest of a message set when one request fails
+ROE_CONTINUE = 1
+
+
+def _dispatch(prog_id):
+    """
+    Create a COM object early-bound through the makepy cache, so property
+    access and calls on it and every object it returns skip IDispatch name
+    lookups. The wrapper is generated on first use; falls back to late
+    binding if it can't be
+    """
+    try:
+        return win32.gencache.EnsureDispatch(prog_id)
+    except pywintypes.com_error:
+        raise
+    except Exception as e:
+        logging.warning(f"Early binding unavailable for {prog_id}, using late binding: {e}")
+        return win32.Dispatch(prog_id)
+
 
 def quickbooks_login():
     """Login to QuickBooks - simplified version from main script"""
@@ -42,14 +165,14 @@ def quickbooks_login():
 
         # Try different QBFC versions
         try:
-            qb = win32.Dispatch("QBFC16.QBSessionManager")
+            qb = _dispatch("QBFC16.QBSessionManager")
         except Exception as dispatch_error:
             logging.error(f"Failed to dispatch QBFC16.QBSessionManager: {dispatch_error}")
             logging.info("Attempting with common fallbacks...")
             try:
-                qb = win32.Dispatch("QBFC15.QBSessionManager")
+                qb = _dispatch("QBFC15.QBSessionManager")
             except:
-                qb = win32.Dispatch("QBFC13.QBSessionManager")
+                qb = _dispatch("QBFC13.QBSessionManager")
 
         logging.info("QBFC Session Manager created successfully.")
 
@@ -87,6 +210,15 @@ def quickbooks_logout(qb):
         logging.error(f"Failed to close QuickBooks session: {str(e)}", exc_info=True)
 
 
+def _probe_attrs(com_object, names):
+    """
+    Return {name: hasattr(com_object, name)}
+    Every hasattr on a COM object is a round trip through IDispatch, and all
+    objects of one type have the same properties, so loops probe once per type
+    """
+    return {name: hasattr(com_object, name) for name in names}
+
+
 def get_all_customers(qb):
     """Get all active customers from QuickBooks"""
     customers = []
@@ -108,20 +240,24 @@ def get_all_customers(qb):
         if customer_ret_list is None:
             return customers
 
+        has = None
         for i in range(customer_ret_list.Count):
             customer = customer_ret_list.GetAt(i)
+            if has is None:
+                has = _probe_attrs(customer, ('IsActive', 'FullName', 'Name', 'PriceLevelRef'))
 
             # Check if customer is active (if property exists)
             is_active = True
-            if hasattr(customer, 'IsActive') and customer.IsActive:
+            if has['IsActive'] and customer.IsActive:
                 is_active = customer.IsActive.GetValue()
 
             if is_active:
                 customers.append({
                     'ListID': customer.ListID.GetValue(),
-                    'FullName': customer.FullName.GetValue() if hasattr(customer,
-                                                                        'FullName') and customer.FullName else '',
-                    'Name': customer.Name.GetValue() if hasattr(customer, 'Name') and customer.Name else ''
+                    'FullName': customer.FullName.GetValue() if has['FullName'] and customer.FullName else '',
+                    'Name': customer.Name.GetValue() if has['Name'] and customer.Name else '',
+                    'PriceLevelID': customer.PriceLevelRef.ListID.GetValue()
+                    if has['PriceLevelRef'] and customer.PriceLevelRef else None
                 })
 
         logging.info(f"Retrieved {len(customers)} active customers")
@@ -133,21 +269,71 @@ def get_all_customers(qb):
 
 
 def get_all_items(qb):
-    """Get all active items that can be sold"""
+    """
+    Get all active items that can be sold
+    Uses one ItemQueryRq for all item types, returning only the fields we use
+    """
     items = []
     try:
-        # Get inventory items
-        items.extend(get_items_by_type(qb, "ItemInventoryQueryRq", "Inventory"))
+        request_msg_set = qb.CreateMsgSetRequest("US", 16, 0)
+        item_query = request_msg_set.AppendItemQueryRq()
 
-        # Get service items
-        items.extend(get_items_by_type(qb, "ItemServiceQueryRq", "Service"))
+        # Only ask for the fields we store
+        for element in ITEM_RET_ELEMENTS:
+            item_query.IncludeRetElementList.Add(element)
 
-        # Get non-inventory items
-        items.extend(get_items_by_type(qb, "ItemNonInventoryQueryRq", "NonInventory"))
+        # Let QuickBooks skip inactive items (nested filter used by item queries)
+        active_filter_applied = False
+        try:
+            item_query.ORListQueryWithOwnerIDAndClass.ListWithClassFilter.ActiveStatus.SetValue(0)  # 0 = Active only
+            active_filter_applied = True
+        except Exception as e:
+            logging.debug(f"ActiveStatus filter not available, filtering inactive items locally: {e}")
 
-        # Get other charge items
-        items.extend(get_items_by_type(qb, "ItemOtherChargeQueryRq", "OtherCharge"))
+        response_msg_set = qb.DoRequests(request_msg_set)
+        response = response_msg_set.ResponseList.GetAt(0)
 
+        if response.StatusCode != 0:
+            logging.warning(f"Error getting items: {response.StatusMessage}")
+            return items
+
+        item_ret_list = response.Detail
+        if item_ret_list is None:
+            return items
+
+        type_counts = defaultdict(int)
+        has_by_type = {}
+        for i in range(item_ret_list.Count):
+            or_item_ret = item_ret_list.GetAt(i)
+
+            # The response mixes all item types - keep the ones that can be sold
+            for ret_name, item_type in SELLABLE_ITEM_TYPES:
+                item = getattr(or_item_ret, ret_name, None)
+                if item is not None:
+                    break
+            else:
+                continue
+
+            has = has_by_type.get(item_type)
+            if has is None:
+                has = has_by_type[item_type] = _probe_attrs(item, ('IsActive', 'FullName', 'Name'))
+
+            # Check if item is active (only when QuickBooks didn't filter)
+            if not active_filter_applied and has['IsActive'] and item.IsActive:
+                if not item.IsActive.GetValue():
+                    continue
+
+            items.append({
+                'ListID': item.ListID.GetValue(),
+                'FullName': item.FullName.GetValue() if has['FullName'] and item.FullName else '',
+                'Name': item.Name.GetValue() if has['Name'] and item.Name else '',
+                'Type': item_type,
+                'BasePrice': _item_base_price(item)
+            })
+            type_counts[item_type] += 1
+
+        for item_type, count in type_counts.items():
+            logging.info(f"Retrieved {count} active {item_type} items")
         logging.info(f"Retrieved {len(items)} total items")
         return items
 
@@ -156,192 +342,343 @@ def get_all_items(qb):
         return items
 
 
-def get_items_by_type(qb, query_method, item_type):
-    """Get items of a specific type"""
-    items = []
+def _item_base_price(item):
+    """Return the item's standard sales price, or None if it has none"""
+    for path in ITEM_BASE_PRICE_PATHS:
+        node = item
+        for name in path:
+            node = getattr(node, name, None)
+            if node is None:
+                break
+        else:
+            return node.GetValue()
+    return None
+
+
+def get_price_levels(qb):
+    """
+    Get all price levels from QuickBooks
+    Returns {PriceLevel ListID: price level} where a price level is either
+    {'FixedPercentage': pct} or {'PerItem': {item ListID: ('Price'|'Percent', value)}}
+    Returns an empty dict if this QuickBooks edition doesn't support price levels
+    """
+    price_levels = {}
     try:
         request_msg_set = qb.CreateMsgSetRequest("US", 16, 0)
-        item_query = getattr(request_msg_set, f"Append{query_method}")()
-
-        # Note: ActiveStatus filter may not be available on all QB versions
-        # We'll get all items and filter inactive ones if needed
+        request_msg_set.AppendPriceLevelQueryRq()
 
         response_msg_set = qb.DoRequests(request_msg_set)
         response = response_msg_set.ResponseList.GetAt(0)
 
         if response.StatusCode != 0:
-            logging.warning(f"Error getting {item_type} items: {response.StatusMessage}")
-            return items
+            logging.info(f"No price levels available: {response.StatusMessage}")
+            return price_levels
+
+        price_level_ret_list = response.Detail
+        if price_level_ret_list is None:
+            return price_levels
+
+        for i in range(price_level_ret_list.Count):
+            price_level_ret = price_level_ret_list.GetAt(i)
+            or_price_level = price_level_ret.ORPriceLevelRet
+
+            if or_price_level.PriceLevelFixedPercentage is not None:
+                price_levels[price_level_ret.ListID.GetValue()] = {
+                    'FixedPercentage': or_price_level.PriceLevelFixedPercentage.GetValue()
+                }
+                continue
+
+            per_item = {}
+            per_item_list = or_price_level.PriceLevelPerItemRetList
+            if per_item_list is not None:
+                for j in range(per_item_list.Count):
+                    per_item_ret = per_item_list.GetAt(j)
+                    or_custom_price = per_item_ret.ORCustomPrice
+                    if or_custom_price.CustomPrice is not None:
+                        custom = ('Price', or_custom_price.CustomPrice.GetValue())
+                    elif or_custom_price.CustomPricePercent is not None:
+                        custom = ('Percent', or_custom_price.CustomPricePercent.GetValue())
+                    else:
+                        continue
+                    per_item[per_item_ret.ItemRef.ListID.GetValue()] = custom
+            price_levels[price_level_ret.ListID.GetValue()] = {'PerItem': per_item}
 
-        item_ret_list = response.Detail
-        if item_ret_list is None:
-            return items
+        logging.info(f"Retrieved {len(price_levels)} price levels")
+        return price_levels
 
-        for i in range(item_ret_list.Count):
-            item = item_ret_list.GetAt(i)
+    except Exception as e:
+        logging.warning(f"Price levels not available, using estimates for all customers: {str(e)}")
+        return {}
 
-            # Check if item is active (if property exists)
-            is_active = True
-            if hasattr(item, 'IsActive') and item.IsActive:
-                is_active = item.IsActive.GetValue()
 
-            if is_active:
-                items.append({
-                    'ListID': item.ListID.GetValue(),
-                    'FullName': item.FullName.GetValue() if hasattr(item, 'FullName') and item.FullName else '',
-                    'Name': item.Name.GetValue() if hasattr(item, 'Name') and item.Name else '',
-                    'Type': item_type
-                })
+def price_level_prices(customer, items, price_level):
+    """
+    Work out a customer's prices from their price level and the item base prices
+    without creating a transaction in QuickBooks
+    """
+    customer_id = customer['ListID']
+    customer_name = customer['FullName'] or customer['Name']
+    per_item = price_level.get('PerItem', {})
+    fixed_percentage = price_level.get('FixedPercentage')
+
+    prices = []
+    for item in items:
+        base_price = item.get('BasePrice') or 0.0
+        custom = per_item.get(item['ListID'])
+
+        if fixed_percentage is not None:
+            rate = base_price * (1 + fixed_percentage / 100)
+        elif custom is None:
+            rate = base_price
+        elif custom[0] == 'Price':
+            rate = custom[1]
+        else:
+            rate = base_price * (1 + custom[1] / 100)
 
-        logging.info(f"Retrieved {len(items)} active {item_type} items")
-        return items
+        prices.append((customer_id, customer_name, item['ListID'], item['Name'],
+                       item['FullName'], round(rate, 2)))
+    return prices
 
-    except Exception as e:
-        logging.error(f"Error retrieving {item_type} items: {str(e)}", exc_info=True)
-        return items
+
+def append_estimate_add(request_msg_set, customer_id, item_batch):
+    """
+    Append an EstimateAddRq for one batch of items to a request message set
+    Returns the RefNumber used for the estimate
+    """
+    estimate_add = request_msg_set.AppendEstimateAddRq()
+
+    # Set customer
+    estimate_add.CustomerRef.ListID.SetValue(customer_id)
+
+    # Set custom reference number to avoid incrementing QB's counter
+    # QuickBooks RefNumber limited to 11 characters
+    # Need to ensure uniqueness to avoid duplicate errors
+    # Format: PX-NNNNNNN where N is a sequential number
+    # Using combination of time and counter for uniqueness
+    current_time = int(time.time())
+    # Use last 5 digits of timestamp + 2 digits of the run-wide estimate counter,
+    # since several worker sessions can create estimates within the same second
+    unique_num = (current_time % 100000) * 100 + (next(_estimate_counter) % 100)
+    ref_number = f"PX-{unique_num:07d}"
+    estimate_add.RefNumber.SetValue(ref_number)
+
+    # Set clear memo indicating this is temporary
+    estimate_add.Memo.SetValue("AUTOMATED PRICE EXTRACTION - DO NOT PROCESS - WILL BE DELETED")
+
+    # Set a template if needed (you might need to adjust this)
+    # estimate_add.TemplateRef.ListID.SetValue("YOUR_TEMPLATE_ID")
+
+    # Add line items
+    items_added = 0
+    for item in item_batch:
+        line_add = estimate_add.OREstimateLineAddList.Append()
+        line_add.EstimateLineAdd.ItemRef.ListID.SetValue(item['ListID'])
+        line_add.EstimateLineAdd.Quantity.SetValue(1.0)  # Quantity of 1 to get unit price
+        # Don't set rate - let QB calculate it
+        items_added += 1
+
+    logging.debug(f"Added {items_added} items to estimate request with RefNumber: {ref_number}")
+    return ref_number
+
+
+def extract_estimate_prices(estimate_ret, customer_id, customer_name, item_batch):
+    """Extract the line item prices from an EstimateRet"""
+    prices = []
+    line_ret_list = estimate_ret.OREstimateLineRetList
+
+    # Index the batch once so each line is matched in constant time
+    by_id = {item['ListID']: item for item in item_batch}
+
+    # Checked once - formatting debug messages per line is costly on full runs
+    debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    if line_ret_list and line_ret_list.Count > 0:
+        if debug_enabled:
+            logging.debug(f"Estimate has {line_ret_list.Count} line items")
+        has = None
+        for i in range(line_ret_list.Count):
+            line_wrapper = line_ret_list.GetAt(i)
+            # The wrapper holds a line or a line group, so this is checked per line
+            if hasattr(line_wrapper, 'EstimateLineRet'):
+                line_ret = line_wrapper.EstimateLineRet
+                # Properties of EstimateLineRet itself are the same on every line -
+                # the child objects can be None, so those stay checked per line
+                if has is None:
+                    has = _probe_attrs(line_ret, ('Rate', 'ORRate', 'ItemRef'))
+
+                item_ref = line_ret.ItemRef if has['ItemRef'] else None
+                item_list_id = item_ref.ListID.GetValue() if item_ref and hasattr(item_ref, 'ListID') else None
+
+                # Get the rate (price)
+                rate = None
+                if has['Rate'] and line_ret.Rate:
+                    rate = line_ret.Rate.GetValue()
+                elif has['ORRate'] and line_ret.ORRate:
+                    # Handle OR rate structure
+                    or_rate = line_ret.ORRate
+                    if hasattr(or_rate, 'Rate') and or_rate.Rate:
+                        rate = or_rate.Rate.GetValue()
+
+                if item_list_id and rate is not None:
+                    # Find the item name from our batch
+                    match = by_id.get(item_list_id)
+                    item_name = match['Name'] if match else ''
+                    item_fullname = match['FullName'] if match else ''
+
+                    prices.append((customer_id, customer_name, item_list_id,
+                                   item_name, item_fullname, rate))
+                elif debug_enabled:
+                    logging.debug(f"Line item missing data: ItemID={item_list_id}, Rate={rate}")
+    else:
+        logging.warning(f"No line items returned in estimate")
+
+    if debug_enabled:
+        logging.debug(f"Extracted {len(prices)} prices from estimate")
+    return prices
 
 
-def create_test_estimate(qb, customer_id, customer_name, item_batch, customer_index, batch_number):
+def append_estimate_mod(request_msg_set, txn_id, edit_sequence, item_batch):
     """
-    Create a temporary estimate to get pricing information
-    Returns a list of item prices or None if failed
+    Append an EstimateModRq that replaces all lines of an existing estimate
+    with a new batch of items
     """
+    estimate_mod = request_msg_set.AppendEstimateModRq()
+    estimate_mod.TxnID.SetValue(txn_id)
+    estimate_mod.EditSequence.SetValue(edit_sequence)
+
+    # Lines left out of the mod are removed, TxnLineID -1 adds a new line
+    items_added = 0
+    for item in item_batch:
+        line_mod = estimate_mod.OREstimateLineModList.Append()
+        line_mod.EstimateLineMod.TxnLineID.SetValue("-1")
+        line_mod.EstimateLineMod.ItemRef.ListID.SetValue(item['ListID'])
+        line_mod.EstimateLineMod.Quantity.SetValue(1.0)  # Quantity of 1 to get unit price
+        items_added += 1
+
+    logging.debug(f"Replaced lines of estimate {txn_id} with {items_added} items")
+
+
+def create_test_estimate(qb, customer_id, customer_name, item_batch, txn_id=None, edit_sequence=None):
+    """
+    Price a batch of items on the customer's temporary estimate
+    The first call (txn_id=None) creates the estimate, later calls reuse it
+    through EstimateMod so each customer only has one estimate to delete
+    Returns (prices, txn_id, edit_sequence, retry_smaller) - prices is None if
+    failed, and retry_smaller says whether a smaller batch might succeed: False
+    when QuickBooks stayed busy, rejected an item reference, or the request
+    could not even be built
+    """
+    sent = False
     try:
         request_msg_set = qb.CreateMsgSetRequest("US", 16, 0)
-        estimate_add = request_msg_set.AppendEstimateAddRq()
-
-        # Set customer
-        estimate_add.CustomerRef.ListID.SetValue(customer_id)
-
-        # Set custom reference number to avoid incrementing QB's counter
-        # QuickBooks RefNumber limited to 11 characters
-        # Need to ensure uniqueness to avoid duplicate errors
-        # Format: PX-NNNNNN where N is a sequential number
-        # Using combination of time and counter for uniqueness
-        current_time = int(time.time())
-        # Use last 5 digits of timestamp + batch number
-        unique_num = (current_time % 100000) * 10 + (batch_number % 10)
-        ref_number = f"PX-{unique_num:06d}"
-        estimate_add.RefNumber.SetValue(ref_number)
-
-        # Set clear memo indicating this is temporary
-        estimate_add.Memo.SetValue("AUTOMATED PRICE EXTRACTION - DO NOT PROCESS - WILL BE DELETED")
-
-        # Set a template if needed (you might need to adjust this)
-        # estimate_add.TemplateRef.ListID.SetValue("YOUR_TEMPLATE_ID")
-
-        # Add line items
-        items_added = 0
-        for item in item_batch:
-            line_add = estimate_add.OREstimateLineAddList.Append()
-            line_add.EstimateLineAdd.ItemRef.ListID.SetValue(item['ListID'])
-            line_add.EstimateLineAdd.Quantity.SetValue(1.0)  # Quantity of 1 to get unit price
-            # Don't set rate - let QB calculate it
-            items_added += 1
-
-        logging.debug(f"Added {items_added} items to estimate request with RefNumber: {ref_number}")
-
-        # Execute the request
-        response_msg_set = qb.DoRequests(request_msg_set)
-        response = response_msg_set.ResponseList.GetAt(0)
+        if txn_id is None:
+            append_estimate_add(request_msg_set, customer_id, item_batch)
+        else:
+            append_estimate_mod(request_msg_set, txn_id, edit_sequence, item_batch)
+
+        # Execute the request, backing off while QuickBooks reports it is busy
+        sent = True
+        for attempt in range(BUSY_MAX_RETRIES + 1):
+            response_msg_set = qb.DoRequests(request_msg_set)
+            response = response_msg_set.ResponseList.GetAt(0)
+            if response.StatusCode not in QB_BUSY_STATUS_CODES or attempt == BUSY_MAX_RETRIES:
+                break
+            delay = min(2 ** attempt * 0.05, 2.0)
+            logging.debug(f"QuickBooks busy ({response.StatusCode}), retrying in {delay:.2f}s")
+            time.sleep(delay)
 
         if response.StatusCode != 0:
-            logging.error(f"Error creating estimate: {response.StatusMessage}")
-            return None
+            logging.error(f"Error {'creating' if txn_id is None else 'modifying'} estimate: "
+                          f"{response.StatusMessage}")
+            return None, txn_id, edit_sequence, response.StatusCode not in QB_NOT_SIZE_STATUS_CODES
 
         # Extract the estimate details
         estimate_ret = response.Detail
         if estimate_ret is None:
-            return None
+            return None, txn_id, edit_sequence, True
 
-        # Get the TxnID for deletion
+        # Keep the TxnID for the next batch and for deletion
         txn_id = estimate_ret.TxnID.GetValue()
-        logging.debug(f"Created estimate {txn_id} with RefNumber: {ref_number}")
-
-        # Extract line item prices
-        prices = []
-        line_ret_list = estimate_ret.OREstimateLineRetList
-
-        if line_ret_list and line_ret_list.Count > 0:
-            logging.debug(f"Estimate has {line_ret_list.Count} line items")
-            for i in range(line_ret_list.Count):
-                line_wrapper = line_ret_list.GetAt(i)
-                if hasattr(line_wrapper, 'EstimateLineRet'):
-                    line_ret = line_wrapper.EstimateLineRet
-
-                    item_ref = line_ret.ItemRef
-                    item_list_id = item_ref.ListID.GetValue() if item_ref and hasattr(item_ref, 'ListID') else None
-
-                    # Get the rate (price)
-                    rate = None
-                    if hasattr(line_ret, 'Rate') and line_ret.Rate:
-                        rate = line_ret.Rate.GetValue()
-                    elif hasattr(line_ret, 'ORRate') and line_ret.ORRate:
-                        # Handle OR rate structure
-                        or_rate = line_ret.ORRate
-                        if hasattr(or_rate, 'Rate') and or_rate.Rate:
-                            rate = or_rate.Rate.GetValue()
-
-                    if item_list_id and rate is not None:
-                        # Find the item name from our batch
-                        item_name = ''
-                        item_fullname = ''
-                        for item in item_batch:
-                            if item['ListID'] == item_list_id:
-                                item_name = item['Name']
-                                item_fullname = item['FullName']
-                                break
-
-                        prices.append({
-                            'CustomerListID': customer_id,
-                            'CustomerName': customer_name,
-                            'ItemListID': item_list_id,
-                            'ItemName': item_name,
-                            'ItemFullName': item_fullname,
-                            'Rate': rate
-                        })
-                    else:
-                        logging.debug(f"Line item missing data: ItemID={item_list_id}, Rate={rate}")
-        else:
-            logging.warning(f"No line items returned in estimate")
-
-        logging.debug(f"Extracted {len(prices)} prices from estimate")
+        edit_sequence = estimate_ret.EditSequence.GetValue()
+        logging.debug(f"Estimate {txn_id} now at EditSequence {edit_sequence}")
 
-        # Delete the estimate
-        delete_estimate(qb, txn_id)
-
-        return prices
+        prices = extract_estimate_prices(estimate_ret, customer_id, customer_name, item_batch)
+        return prices, txn_id, edit_sequence, False
 
     except Exception as e:
         logging.error(f"Error in create_test_estimate: {str(e)}", exc_info=True)
-        return None
+        return None, txn_id, edit_sequence, sent
 
 
-def delete_estimate(qb, txn_id):
-    """Delete an estimate by TxnID"""
+def delete_estimates(qb, txn_ids):
+    """Delete estimates by TxnID in a single DoRequests round-trip"""
+    if not txn_ids:
+        return
+
     try:
         request_msg_set = qb.CreateMsgSetRequest("US", 16, 0)
-        txn_del = request_msg_set.AppendTxnDelRq()
-        txn_del.TxnDelType.SetValue(11)  # 11 = Estimate
-        txn_del.TxnID.SetValue(txn_id)
+        # One estimate failing to delete must not stop the others
+        request_msg_set.Attributes.OnError = ROE_CONTINUE
+
+        for txn_id in txn_ids:
+            txn_del = request_msg_set.AppendTxnDelRq()
+            txn_del.TxnDelType.SetValue(11)  # 11 = Estimate
+            txn_del.TxnID.SetValue(txn_id)
 
         response_msg_set = qb.DoRequests(request_msg_set)
-        response = response_msg_set.ResponseList.GetAt(0)
+        response_list = response_msg_set.ResponseList
 
-        if response.StatusCode != 0:
-            logging.warning(f"Error deleting estimate {txn_id}: {response.StatusMessage}")
-        else:
-            logging.debug(f"Successfully deleted estimate {txn_id}")
+        debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+        for i in range(response_list.Count):
+            response = response_list.GetAt(i)
+            txn_id = txn_ids[i]
+            if response.StatusCode != 0:
+                logging.warning(f"Error deleting estimate {txn_id}: {response.StatusMessage}")
+            elif debug_enabled:
+                logging.debug(f"Successfully deleted estimate {txn_id}")
 
     except Exception as e:
-        logging.error(f"Error deleting estimate {txn_id}: {str(e)}", exc_info=True)
+        logging.error(f"Error deleting estimates {txn_ids}: {str(e)}", exc_info=True)
+
+
+def get_conn():
+    """Return the shared database connection, opening it on first use"""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        atexit.register(close_conn)
+    return _conn
+
+
+def close_conn():
+    """Close the shared database connection"""
+    global _conn, _write_cursor
+    if _conn is not None:
+        _write_cursor = None
+        _conn.close()
+        _conn = None
+
 
+def get_write_cursor():
+    """Return the long-lived cursor used to write prices"""
+    global _write_cursor
+    if _write_cursor is None:
+        _write_cursor = get_conn().cursor()
+    return _write_cursor
+
+
+def _init_db(with_name_indexes=True):
+    """
+    Create or migrate the price tables and indexes - runs once per process
+    with_name_indexes=False leaves out the name indexes, for a full rebuild
+    that drops them anyway and builds them once the load is done
+    """
+    global _db_initialized
+    if _db_initialized:
+        return
 
-def save_customer_prices(customer_prices):
-    """Save customer prices to database"""
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
 
         # Check if table exists
@@ -365,8 +702,6 @@ def save_customer_prices(customer_prices):
             if 'ItemFullName' not in columns:
                 logging.info("Adding ItemFullName column to existing table...")
                 cursor.execute("ALTER TABLE customer_price_pages ADD COLUMN ItemFullName TEXT")
-
-            conn.commit()
         else:
             # Create table with all columns
             cursor.execute('''
@@ -394,78 +729,140 @@ def save_customer_prices(customer_prices):
         ON customer_price_pages (ItemListID)
         ''')
 
+        if with_name_indexes:
+            for index_sql in NAME_INDEXES.values():
+                cursor.execute(index_sql)
+
+        # Progress table used for resuming
         cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_customer_prices_customer_name 
-        ON customer_price_pages (CustomerName)
+        CREATE TABLE IF NOT EXISTS price_extraction_progress (
+            id INTEGER PRIMARY KEY,
+            last_customer_id TEXT,
+            last_customer_index INTEGER,
+            total_customers INTEGER,
+            start_time TEXT,
+            last_update TEXT
+        )
         ''')
 
+        # Progress is a single row with id=1 - older versions appended a row per
+        # save, so keep only the latest one
         cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_customer_prices_item_name 
-        ON customer_price_pages (ItemName)
+        DELETE FROM price_extraction_progress
+        WHERE id <> (SELECT MAX(id) FROM price_extraction_progress)
         ''')
+        cursor.execute('UPDATE price_extraction_progress SET id = 1 WHERE id <> 1')
+
+        conn.commit()
+        _db_initialized = True
+
+    except sqlite3.Error as e:
+        logging.error(f"Database error initializing price tables: {e}", exc_info=True)
+
+
+def apply_bulk_load_pragmas():
+    """Tune the shared connection for bulk-loading prices"""
+    _init_db()
+
+    conn = get_conn()
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    logging.debug("Applied bulk-load PRAGMAs for price extraction")
+
+
+def restore_normal_pragmas():
+    """Switch the database back to WAL/NORMAL after a bulk load"""
+    try:
+        conn = get_conn()
+        for pragma in NORMAL_PRAGMAS:
+            conn.execute(pragma)
+        logging.debug("Restored normal database PRAGMAs")
+    except sqlite3.Error as e:
+        logging.error(f"Database error restoring PRAGMAs: {e}", exc_info=True)
+
+
+def drop_name_indexes():
+    """Drop the name indexes so the bulk load doesn't have to maintain them"""
+    global _name_indexes_dropped
+    _init_db()
+
+    try:
+        conn = get_conn()
+        with conn:
+            for index_name in NAME_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        _name_indexes_dropped = True
+        logging.debug("Dropped name indexes for the bulk load")
+    except sqlite3.Error as e:
+        logging.error(f"Database error dropping name indexes: {e}", exc_info=True)
+
+
+def create_name_indexes():
+    """Rebuild the name indexes after a bulk load - a no-op unless drop_name_indexes ran"""
+    global _name_indexes_dropped
+    if not _name_indexes_dropped:
+        return
+
+    try:
+        conn = get_conn()
+        with conn:
+            for index_sql in NAME_INDEXES.values():
+                conn.execute(index_sql)
+        _name_indexes_dropped = False
+        logging.debug("Created name indexes")
+    except sqlite3.Error as e:
+        logging.error(f"Database error creating name indexes: {e}", exc_info=True)
+
+
+def save_customer_prices(customer_prices, full_rebuild=False):
+    """
+    Save customer prices to database
+    customer_prices is a sequence of price rows (see PRICE_ROW_FIELDS)
+    full_rebuild: the table was emptied for this run, so plain INSERTs are used
+    instead of checking every row for an existing price
+    """
+    _init_db()
+
+    try:
+        conn = get_conn()
 
         # Insert or update prices
         current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        rows = [(*price_row, current_time) for price_row in customer_prices]
 
-        inserted = 0
-        updated = 0
+        # One transaction for the whole batch
+        with conn:
+            get_write_cursor().executemany(INSERT_SQL if full_rebuild else UPSERT_SQL, rows)
 
-        for price_info in customer_prices:
-            cursor.execute('''
-            INSERT INTO customer_price_pages 
-            (CustomerListID, CustomerName, ItemListID, ItemName, ItemFullName, Price, LastUpdated)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(CustomerListID, ItemListID) DO UPDATE SET
-                CustomerName = excluded.CustomerName,
-                ItemName = excluded.ItemName,
-                ItemFullName = excluded.ItemFullName,
-                Price = excluded.Price,
-                LastUpdated = excluded.LastUpdated
-            ''', (
-                price_info['CustomerListID'],
-                price_info['CustomerName'],
-                price_info['ItemListID'],
-                price_info['ItemName'],
-                price_info['ItemFullName'],
-                price_info['Rate'],
-                current_time
-            ))
-
-            if cursor.rowcount == 1:
-                inserted += 1
-            else:
-                updated += 1
-
-        conn.commit()
-        logging.info(f"Saved {len(customer_prices)} customer prices to database ({inserted} new, {updated} updated)")
+        logging.info(f"Saved {len(rows)} customer prices to database")
 
     except sqlite3.Error as e:
         logging.error(f"Database error saving customer prices: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
+
+
+def clear_customer_prices():
+    """Delete all saved prices before a full rebuild"""
+    _init_db()
+
+    try:
+        conn = get_conn()
+        with conn:
+            conn.execute('DELETE FROM customer_price_pages')
+        logging.info("Cleared existing customer prices for a full rebuild")
+    except sqlite3.Error as e:
+        logging.error(f"Database error clearing customer prices: {e}", exc_info=True)
+        raise
 
 
 def load_progress():
     """Load progress from database"""
-    conn = None
+    _init_db()
+
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
 
-        # Check if progress table exists
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS price_extraction_progress (
-            id INTEGER PRIMARY KEY,
-            last_customer_id TEXT,
-            last_customer_index INTEGER,
-            total_customers INTEGER,
-            start_time TEXT,
-            last_update TEXT
-        )
-        ''')
-
-        cursor.execute('SELECT * FROM price_extraction_progress ORDER BY id DESC LIMIT 1')
+        cursor.execute('SELECT * FROM price_extraction_progress WHERE id = 1')
         row = cursor.fetchone()
 
         if row:
@@ -481,33 +878,140 @@ def load_progress():
     except sqlite3.Error as e:
         logging.error(f"Database error loading progress: {e}", exc_info=True)
         return None
-    finally:
-        if conn:
-            conn.close()
 
 
 def save_progress(customer_id, customer_index, total_customers, start_time):
-    """Save progress to database"""
-    conn = None
+    """Save progress to database (overwrites the single progress row)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
 
         current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
         cursor.execute('''
         INSERT INTO price_extraction_progress 
-        (last_customer_id, last_customer_index, total_customers, start_time, last_update)
-        VALUES (?, ?, ?, ?, ?)
+        (id, last_customer_id, last_customer_index, total_customers, start_time, last_update)
+        VALUES (1, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            last_customer_id = excluded.last_customer_id,
+            last_customer_index = excluded.last_customer_index,
+            total_customers = excluded.total_customers,
+            start_time = excluded.start_time,
+            last_update = excluded.last_update
         ''', (customer_id, customer_index, total_customers, start_time, current_time))
 
         conn.commit()
 
     except sqlite3.Error as e:
         logging.error(f"Database error saving progress: {e}", exc_info=True)
+
+
+def process_customer(qb, customer, items, price_levels=None):
+    """
+    Get the prices of all items for one customer
+    Customers with a price level are priced directly from it, the rest
+    through a temporary estimate
+    Returns (prices, txn_id) - txn_id is the temporary estimate to delete
+    """
+    customer_id = customer['ListID']
+    customer_name = customer['FullName'] or customer['Name']
+
+    price_level = (price_levels or {}).get(customer.get('PriceLevelID'))
+    if price_level is not None:
+        customer_prices = price_level_prices(customer, items, price_level)
+        logging.info(f"  [{customer_name}] Priced {len(customer_prices)} items from price level")
+        return customer_prices, None
+
+    customer_prices = []
+
+    # Process items in batches, all on the same estimate
+    global _batch_size
+    txn_id = None
+    edit_sequence = None
+    batch_start = 0
+    while batch_start < len(items):
+        batch_size = _batch_size
+        item_batch = items[batch_start:batch_start + batch_size]
+        full_batch_len = len(item_batch)
+
+        logging.info(f"  [{customer_name}] Processing items {batch_start + 1}-{batch_start + len(item_batch)} of {len(items)}")
+
+        # Add or modify the test estimate and get prices
+        prices, txn_id, edit_sequence, retry_smaller = create_test_estimate(
+            qb, customer_id, customer_name, item_batch, txn_id, edit_sequence)
+
+        # QuickBooks may reject estimates with too many lines - halve the batch
+        # and retry, remembering the smaller size only once it works. Failures
+        # that don't depend on the size (busy, bad item, request not sent) skip it
+        while prices is None and retry_smaller and batch_size > MIN_BATCH_SIZE:
+            batch_size = max(batch_size // 2, MIN_BATCH_SIZE)
+            item_batch = items[batch_start:batch_start + batch_size]
+            logging.warning(f"    [{customer_name}] Retrying with batch size {batch_size}")
+            prices, txn_id, edit_sequence, retry_smaller = create_test_estimate(
+                qb, customer_id, customer_name, item_batch, txn_id, edit_sequence)
+            if prices is not None:
+                with _batch_size_lock:
+                    if batch_size < _batch_size:
+                        _batch_size = batch_size
+                        logging.info(f"Batch size reduced to {batch_size}")
+
+        if prices:
+            customer_prices.extend(prices)
+            logging.info(f"    [{customer_name}] Extracted {len(prices)} prices from this batch")
+        else:
+            logging.warning(f"    [{customer_name}] No prices extracted from this batch")
+
+        # If even the smallest batch failed, skip the whole original batch
+        batch_start += len(item_batch) if prices is not None else full_batch_len
+
+    return customer_prices, txn_id
+
+
+def _session_worker(customer_queue, result_queue, items, price_levels, total_customers):
+    """
+    Price customers from customer_queue on a QuickBooks session of its own
+    COM objects belong to the thread that created them, so each worker thread
+    initializes COM, logs in, and logs out itself
+    Puts (customer_index, prices) on result_queue per customer and None when done
+    """
+    pythoncom.CoInitialize()
+    qb = None
+    pending_deletes = []  # TxnIDs of temporary estimates still in QuickBooks
+    try:
+        qb = quickbooks_login()
+        if not qb:
+            logging.error("Worker could not open a QuickBooks session")
+            return
+
+        while True:
+            try:
+                customer_index, customer = customer_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            customer_name = customer['FullName'] or customer['Name']
+            logging.info(f"Processing customer {customer_index + 1}/{total_customers}: {customer_name}")
+
+            prices, txn_id = process_customer(qb, customer, items, price_levels)
+
+            # Estimates are deleted in batches to save round-trips
+            if txn_id:
+                pending_deletes.append(txn_id)
+            if len(pending_deletes) >= PROGRESS_SAVE_INTERVAL:
+                delete_estimates(qb, pending_deletes)
+                pending_deletes.clear()
+
+            result_queue.put((customer_index, prices))
+
+    except Exception as e:
+        logging.error(f"Error in price extraction worker: {str(e)}", exc_info=True)
     finally:
-        if conn:
-            conn.close()
+        # Don't leave temporary estimates behind in QuickBooks
+        if qb:
+            delete_estimates(qb, pending_deletes)
+            quickbooks_logout(qb)
+        pythoncom.CoUninitialize()
+        result_queue.put(None)
 
 
 def extract_all_customer_prices(qb, resume=True):
@@ -526,6 +1030,10 @@ def extract_all_customer_prices(qb, resume=True):
             logging.error("No customers or items found. Aborting.")
             return
 
+        # Customers on a price level don't need a temporary estimate
+        logging.info("Retrieving price levels...")
+        price_levels = get_price_levels(qb)
+
         # Apply test mode limits
         if TEST_MODE:
             logging.info(f"TEST MODE: Limiting to {TEST_CUSTOMER_LIMIT} customers and {TEST_ITEM_LIMIT} items")
@@ -542,60 +1050,105 @@ def extract_all_customer_prices(qb, resume=True):
                 start_index = progress['last_customer_index'] + 1
                 start_time = progress['start_time']  # Keep original start time
 
+        # A fresh (non-test) run rebuilds the whole table, so every row is new.
+        # Only then are the name indexes dropped for the load - test and resumed
+        # runs write into a populated table and keep them
+        full_rebuild = not resume and not TEST_MODE
+        _init_db(with_name_indexes=not full_rebuild)
+
+        # Tune the database for the bulk load
+        apply_bulk_load_pragmas()
+        if full_rebuild:
+            drop_name_indexes()
+            clear_customer_prices()
+
         total_combinations = len(customers) * len(items)
         logging.info(f"Total price combinations to extract: {total_combinations:,}")
         logging.info(f"Processing {len(customers)} customers with {len(items)} items")
 
-        customer_prices = []
+        # Rows waiting to be written - flushed every PRICE_BUFFER_SIZE rows
+        # so memory stays bounded however many customers are in flight
+        price_buffer = deque()
+        sample_prices = []
         prices_extracted = 0
 
-        # Process each customer
+        # Queue up the customers for the worker sessions
+        customer_queue = queue.Queue()
         for customer_index in range(start_index, len(customers)):
-            customer = customers[customer_index]
-            customer_id = customer['ListID']
-            customer_name = customer['FullName'] or customer['Name']
-
-            logging.info(f"Processing customer {customer_index + 1}/{len(customers)}: {customer_name}")
-
-            # Process items in batches
-            batch_number = 0
-            for batch_start in range(0, len(items), BATCH_SIZE):
-                batch_end = min(batch_start + BATCH_SIZE, len(items))
-                item_batch = items[batch_start:batch_end]
-                batch_number += 1
-
-                logging.info(f"  Processing items {batch_start + 1}-{batch_end} of {len(items)}")
+            customer_queue.put((customer_index, customers[customer_index]))
+        result_queue = queue.Queue()
+
+        worker_count = max(1, min(WORKER_COUNT, len(customers) - start_index))
+        logging.info(f"Using {worker_count} QuickBooks session(s)")
+
+        # Customers finish out of order - progress only moves past customers
+        # that are done with no gaps before them, so resume never skips one
+        completed = set()
+        next_index = start_index
+        customers_since_save = 0
+
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            for _ in range(worker_count):
+                executor.submit(_session_worker, customer_queue, result_queue, items, price_levels,
+                                len(customers))
+
+            # This thread is the only database writer
+            workers_running = worker_count
+            while workers_running:
+                result = result_queue.get()
+                if result is None:
+                    workers_running -= 1
+                    continue
+
+                customer_index, prices = result
+                completed.add(customer_index)
+                price_buffer.extend(prices)
+                prices_extracted += len(prices)
+                customers_since_save += 1
+                if TEST_MODE and len(sample_prices) < 10:
+                    sample_prices.extend(prices[:10 - len(sample_prices)])
+
+                if len(price_buffer) >= PRICE_BUFFER_SIZE:
+                    save_customer_prices(price_buffer, full_rebuild)
+                    price_buffer.clear()
+
+                # Save progress periodically (or always in test mode) - every
+                # completed customer's prices are written first
+                if TEST_MODE or customers_since_save >= PROGRESS_SAVE_INTERVAL:
+                    if price_buffer:
+                        save_customer_prices(price_buffer, full_rebuild)
+                        price_buffer.clear()
+                    while next_index in completed:
+                        completed.discard(next_index)
+                        next_index += 1
+                    if not TEST_MODE and next_index > start_index:
+                        save_progress(customers[next_index - 1]['ListID'], next_index - 1,
+                                      len(customers), start_time)
+                    customers_since_save = 0
+                    logging.info(f"Progress saved. Extracted {prices_extracted:,} prices so far.")
 
-                # Create test estimate and get prices
-                prices = create_test_estimate(qb, customer_id, customer_name, item_batch, customer_index, batch_number)
-
-                if prices:
-                    customer_prices.extend(prices)
-                    prices_extracted += len(prices)
-                    logging.info(f"    Extracted {len(prices)} prices from this batch")
-                else:
-                    logging.warning(f"    No prices extracted from this batch")
+        # Save any remaining prices
+        if price_buffer:
+            save_customer_prices(price_buffer, full_rebuild)
+            logging.info(f"Final save: {len(price_buffer)} prices")
+            price_buffer.clear()
 
-                # Small delay to avoid overwhelming QuickBooks
-                time.sleep(0.1)
+        # Everything is written - build the name indexes in one pass if they were dropped
+        create_name_indexes()
 
-            # Save progress periodically (or always in test mode)
-            if TEST_MODE or (customer_index + 1) % PROGRESS_SAVE_INTERVAL == 0:
-                save_customer_prices(customer_prices)
-                if not TEST_MODE:
-                    save_progress(customer_id, customer_index, len(customers), start_time)
-                logging.info(f"Progress saved. Extracted {prices_extracted:,} prices so far.")
-                if not TEST_MODE:
-                    customer_prices.clear()  # Clear to save memory
-
-        # Save any remaining prices
-        if customer_prices:
-            save_customer_prices(customer_prices)
-            logging.info(f"Final save: {len(customer_prices)} prices")
+        while next_index in completed:
+            completed.discard(next_index)
+            next_index += 1
 
         # Clear progress on completion (not in test mode)
         if not TEST_MODE:
-            clear_progress()
+            if next_index >= len(customers):
+                clear_progress()
+            else:
+                logging.warning(f"Customer {next_index + 1} was not processed - rerun to resume from there")
+                if next_index > start_index:
+                    save_progress(customers[next_index - 1]['ListID'], next_index - 1,
+                                  len(customers), start_time)
 
         end_time = datetime.datetime.now(datetime.timezone.utc)
         duration = (datetime.datetime.fromisoformat(end_time.isoformat()) -
@@ -609,8 +1162,8 @@ def extract_all_customer_prices(qb, resume=True):
             # Show sample of extracted prices
             logging.info("\nSample of extracted prices:")
             sample_count = 0
-            for price_info in customer_prices[:10]:
-                logging.info(f"  {price_info['CustomerName']} - {price_info['ItemName']}: ${price_info['Rate']:.2f}")
+            for _, customer_name, _, item_name, _, rate in sample_prices:
+                logging.info(f"  {customer_name} - {item_name}: ${rate:.2f}")
                 sample_count += 1
 
     except Exception as e:
@@ -620,25 +1173,20 @@ def extract_all_customer_prices(qb, resume=True):
 
 def clear_progress():
     """Clear the progress table"""
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM price_extraction_progress')
         conn.commit()
         logging.info("Progress cleared")
     except sqlite3.Error as e:
         logging.error(f"Database error clearing progress: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
 
 
 def verify_price_data():
     """Verify the extracted price data"""
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
 
         # Check if table exists
@@ -730,9 +1278,6 @@ def verify_price_data():
 
     except sqlite3.Error as e:
         logging.error(f"Database error verifying price data: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
 
 
 def main():
@@ -744,11 +1289,15 @@ def main():
         logging.info(f"Will process {TEST_CUSTOMER_LIMIT} customer(s) and {TEST_ITEM_LIMIT} items")
 
     # Parse command line arguments
+    args = [arg.lower() for arg in sys.argv[1:]]
     resume = True  # Default to resume
-    if len(sys.argv) > 1:
-        if sys.argv[1].lower() == '--fresh':
-            resume = False
-            logging.info("Starting fresh extraction (not resuming)")
+    if '--fresh' in args:
+        resume = False
+        logging.info("Starting fresh extraction (not resuming)")
+    if '--verbose' in args:
+        # Write debug messages to the log file (console stays at INFO)
+        logging.getLogger().setLevel(logging.DEBUG)
+        logging.info("Verbose logging enabled")
 
     # Connect to QuickBooks
     qb = quickbooks_login()
@@ -770,6 +1319,12 @@ def main():
         # Logout from QuickBooks
         quickbooks_logout(qb)
 
+        # Put back the name indexes if a full rebuild stopped early
+        create_name_indexes()
+
+        # Undo the bulk-load PRAGMAs
+        restore_normal_pragmas()
+
     logging.info("\n==== CUSTOMER PRICE PAGES EXTRACTION COMPLETED ====")
 
     if TEST_MODE:
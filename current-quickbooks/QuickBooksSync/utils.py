@@ -4,7 +4,7 @@ Utility functions for QuickBooks sync
 import datetime
 import pywintypes
 import logging
-from typing import Any, Optional, Dict, Set
+from typing import Any, Optional
 
 
 def get_com_value(com_obj: Any, prop_name: str) -> Any:
@@ -215,88 +215,6 @@ def get_list_type_description(type_number: int) -> str:
     return type_mapping.get(type_number, f"ListType_{type_number}")
 
 
-def determine_field_types(records: list, current_types: Dict[str, Set[str]]) -> None:
-    """
-    Determine field types from records
-
-    Args:
-        records: List of record dictionaries
-        current_types: Dictionary to update with field types
-    """
-    for record in records:
-        for field, value in record.items():
-            if value is None or value == '':
-                current_types[field].add('TEXT')
-            elif isinstance(value, bool):
-                current_types[field].add('INTEGER')
-            elif isinstance(value, int):
-                current_types[field].add('INTEGER')
-            elif isinstance(value, float):
-                current_types[field].add('REAL')
-            elif isinstance(value, str):
-                if value.lower() in ['true', 'false']:
-                    current_types[field].add('INTEGER')
-                elif _is_int_str(value):
-                    current_types[field].add('INTEGER')
-                elif _is_float_str(value):
-                    current_types[field].add('REAL')
-                elif is_date_iso_str(value):
-                    current_types[field].add('TEXT')
-                else:
-                    current_types[field].add('TEXT')
-            else:
-                current_types[field].add('TEXT')
-
-
-def resolve_field_types(field_names: Set[str], field_types: Dict[str, Set[str]]) -> Dict[str, str]:
-    """
-    Resolve field types to single type per field
-
-    Args:
-        field_names: Set of all field names
-        field_types: Dictionary of field names to sets of possible types
-
-    Returns:
-        Dictionary of field names to resolved types
-    """
-    resolved = {}
-
-    for field in field_names:
-        types = field_types.get(field, {'TEXT'})
-        if not types:
-            types = {'TEXT'}
-
-        # Priority: TEXT > REAL > INTEGER
-        if 'TEXT' in types:
-            resolved[field] = 'TEXT'
-        elif 'REAL' in types:
-            resolved[field] = 'REAL'
-        elif 'INTEGER' in types:
-            resolved[field] = 'INTEGER'
-        else:
-            resolved[field] = 'TEXT'
-
-    return resolved
-
-
-def _is_int_str(s: str) -> bool:
-    """Check if string represents an integer"""
-    try:
-        int(s)
-        return True
-    except ValueError:
-        return False
-
-
-def _is_float_str(s: str) -> bool:
-    """Check if string represents a float"""
-    try:
-        float(s)
-        return '.' in s or 'e' in s.lower()
-    except ValueError:
-        return False
-
-
 def log_com_error(error: Exception, context: str) -> None:
     """
     Log COM error with detailed information